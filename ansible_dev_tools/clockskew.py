@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+
+# clockskew:
+#   Estimate the clock skew between the controller and a managed host.
+#
+# Every module the controller runs shows up twice: as an AnsiballZ_<name>.py
+# execution in the controller's debug log and as an "ansible-<name>: Invoked"
+# line in the remote syslog. Pairing all of those up gives one offset sample
+# per invocation. The offset (and optionally a linear drift) is fit with a
+# median/least-squares fit that ignores mismatched pairs, and the residual
+# says how far the merged timeline can be trusted.
+
+import bisect
+import math
+import re
+
+from collections import namedtuple
+from statistics import median
+
+
+# /usr/bin/python /root/.ansible/tmp/ansible-tmp-1543.../AnsiballZ_command.py
+INVOCATION_RE = re.compile(r'python[\d.]* \S*AnsiballZ_(\w+)\.py')
+# Nov 27 10:33:12 node1 ansible-command: Invoked with _raw_params=...
+INVOKED_RE = re.compile(r'(ansible-\w+)(?:\[\d+\])?: Invoked')
+
+# pairs further than this from the fit are never trusted
+MIN_TOLERANCE = 1.0
+
+
+class ClockSkew(namedtuple('ClockSkew', ['offset', 'drift', 't0', 'residual', 'matches'])):
+    '''remote time + offset + drift * (remote time - t0) = controller time'''
+
+    __slots__ = ()
+
+    def correct(self, ts):
+        return ts + self.offset + self.drift * (ts - self.t0)
+
+
+def controller_invocations(entries):
+    '''(ts, line) pairs -> (ts, module) for each AnsiballZ execution'''
+    invocations = []
+    for (ts, line) in entries:
+        if 'AnsiballZ_' not in line:
+            continue
+        match = INVOCATION_RE.search(line)
+        if match:
+            invocations.append((ts, 'ansible-' + match.group(1)))
+    return invocations
+
+
+def remote_invocations(entries):
+    '''(ts, line) pairs -> (ts, module or None) for each Invoke log'''
+    invocations = []
+    for (ts, line) in entries:
+        if 'Invoke' not in line:
+            continue
+        match = INVOKED_RE.search(line)
+        invocations.append((ts, match.group(1) if match else None))
+    return invocations
+
+
+def _match(local, remote, skew):
+    '''Pair each controller invocation with the nearest remote one'''
+    everything = sorted(x[0] for x in remote)
+    by_module = {}
+    for (ts, module) in remote:
+        by_module.setdefault(module, []).append(ts)
+    for tslist in by_module.values():
+        tslist.sort()
+
+    pairs = []
+    for (ts, module) in local:
+        candidates = by_module.get(module) or everything
+        # invert the fit to guess where the remote clock was
+        guess = (ts - skew.offset + skew.drift * skew.t0) / (1.0 + skew.drift)
+        idx = bisect.bisect_left(candidates, guess)
+        nearest = [candidates[x] for x in (idx - 1, idx) if 0 <= x < len(candidates)]
+        rts = min(nearest, key=lambda x: abs(x - guess))
+        pairs.append((rts, ts))
+    return pairs
+
+
+def _fit(pairs, t0, drift):
+    '''median offset, or a least squares offset+drift'''
+    deltas = [l - r for (r, l) in pairs]
+    if not drift or len(pairs) < 3:
+        return ClockSkew(median(deltas), 0.0, t0, None, len(pairs))
+    xs = [r - t0 for (r, l) in pairs]
+    xmean = sum(xs) / len(xs)
+    dmean = sum(deltas) / len(deltas)
+    sxx = sum((x - xmean) ** 2 for x in xs)
+    if sxx == 0:
+        return ClockSkew(median(deltas), 0.0, t0, None, len(pairs))
+    slope = sum((x - xmean) * (d - dmean) for (x, d) in zip(xs, deltas)) / sxx
+    return ClockSkew(dmean - slope * xmean, slope, t0, None, len(pairs))
+
+
+def estimate_clock_skew(local, remote, drift=False, iterations=3):
+    '''Fit the skew between (ts, module) controller and remote invocations
+
+    Returns a ClockSkew whose residual is the rms error of the pairs that
+    were used, or None when either side has no invocations.
+    '''
+
+    if not local or not remote:
+        return None
+
+    # seed by pairing each module's newest invocations on both sides, as
+    # the oldest remote logs are the ones that get rotated away
+    local_by = {}
+    remote_by = {}
+    for (ts, module) in local:
+        local_by.setdefault(module, []).append(ts)
+    for (ts, module) in remote:
+        remote_by.setdefault(module, []).append(ts)
+    seeds = []
+    for (module, tslist) in local_by.items():
+        rtslist = sorted(remote_by.get(module, []))
+        seeds += [l - r for (l, r) in zip(reversed(sorted(tslist)), reversed(rtslist))]
+    if not seeds:
+        seeds = [l[0] - r[0] for (l, r) in zip(reversed(local), reversed(remote))]
+    t0 = median(x[0] for x in remote)
+    skew = ClockSkew(median(seeds), 0.0, t0, None, 0)
+
+    for idx in range(iterations):
+        pairs = _match(local, remote, skew)
+        residuals = [l - skew.correct(r) for (r, l) in pairs]
+        center = median(residuals)
+        spread = median(abs(x - center) for x in residuals) * 1.4826 * 3
+        tolerance = max(spread, MIN_TOLERANCE)
+        inliers = [p for (p, e) in zip(pairs, residuals) if abs(e - center) <= tolerance]
+        skew = _fit(inliers or pairs, t0, drift)
+
+    used = inliers or pairs
+    residual = math.sqrt(sum((l - skew.correct(r)) ** 2 for (r, l) in used) / len(used))
+    return skew._replace(residual=residual)
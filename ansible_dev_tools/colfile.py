@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+
+# colfile:
+#   An uncompressed column file that is read through mmap.
+#
+# A json header lists each column's type and where it's data starts, and
+# each column is then a plain array: float64 (nan is null), int64 (the
+# smallest int64 is null), int8 booleans (-1 is null) or int32 codes into a
+# table of distinct strings (-1 is null). Columns are 8 byte aligned, so a
+# reader maps the file and views the columns it needs in place without
+# parsing or copying the rest. The writer spools each column to it's own
+# temporary file as rows arrive, so neither side needs the rows in memory.
+
+import json
+import math
+import mmap
+import os
+import shutil
+import struct
+import sys
+
+from array import array
+
+
+MAGIC = b'ADTM'
+VERSION = 1
+
+FLOAT = 'd'
+INT = 'q'
+BOOL = 'b'
+STRING = 's'
+
+TYPES = (FLOAT, INT, BOOL, STRING)
+
+INT_NULL = -2**63
+
+# how many values a column holds before they go out to it's spool file
+SPOOL_ROWS = 65536
+
+_HEADER = struct.Struct('<4sIQ')
+_ALIGN = 8
+
+
+def _pad(length):
+    return (_ALIGN - length % _ALIGN) % _ALIGN
+
+
+class ColumnWriter(object):
+
+    '''Write rows of values for a fixed list of (name, type) columns'''
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = list(columns)
+        for (name, ctype) in self.columns:
+            if ctype not in TYPES:
+                raise ValueError('unknown column type %s for %s' % (ctype, name))
+        self.nrows = 0
+        self.strings = [{} for x in self.columns]
+        self.buffers = [self._new_buffer(ctype) for (name, ctype) in self.columns]
+        self.spooldir = path + '.tmp'
+        if os.path.exists(self.spooldir):
+            shutil.rmtree(self.spooldir)
+        os.makedirs(self.spooldir)
+        self.spools = [
+            open(os.path.join(self.spooldir, str(idc)), 'wb')
+            for idc in range(len(self.columns))
+        ]
+
+    @staticmethod
+    def _new_buffer(ctype):
+        return array('i' if ctype == STRING else ctype)
+
+    def append(self, values):
+        '''Add one row, a sequence of values in column order'''
+        for (idc, value) in enumerate(values):
+            ctype = self.columns[idc][1]
+            buf = self.buffers[idc]
+            if ctype == FLOAT:
+                buf.append(float('nan') if value is None else value)
+            elif ctype == INT:
+                buf.append(INT_NULL if value is None else value)
+            elif ctype == BOOL:
+                buf.append(-1 if value is None else (1 if value else 0))
+            elif value is None:
+                buf.append(-1)
+            else:
+                strings = self.strings[idc]
+                code = strings.get(value)
+                if code is None:
+                    code = strings[value] = len(strings)
+                buf.append(code)
+        self.nrows += 1
+        if self.nrows % SPOOL_ROWS == 0:
+            self.spool()
+
+    def spool(self):
+        for (idc, buf) in enumerate(self.buffers):
+            buf.tofile(self.spools[idc])
+            self.buffers[idc] = self._new_buffer(self.columns[idc][1])
+
+    def close(self):
+        self.spool()
+        for f in self.spools:
+            f.close()
+
+        header = {
+            'nrows': self.nrows,
+            'byteorder': sys.byteorder,
+            'columns': [],
+        }
+        offset = 0
+        sizes = []
+        for (idc, (name, ctype)) in enumerate(self.columns):
+            size = os.path.getsize(os.path.join(self.spooldir, str(idc)))
+            column = {'name': name, 'type': ctype, 'offset': offset}
+            if ctype == STRING:
+                strings = self.strings[idc]
+                column['strings'] = sorted(strings, key=strings.get)
+            header['columns'].append(column)
+            sizes.append(size)
+            offset += size + _pad(size)
+
+        blob = json.dumps(header).encode('utf-8')
+        blob += b' ' * _pad(_HEADER.size + len(blob))
+        with open(self.path, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, len(blob)))
+            f.write(blob)
+            for (idc, size) in enumerate(sizes):
+                with open(os.path.join(self.spooldir, str(idc)), 'rb') as spool:
+                    shutil.copyfileobj(spool, f)
+                f.write(b'\0' * _pad(size))
+        shutil.rmtree(self.spooldir)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class Column(object):
+
+    '''A read only view of one column, values are decoded on access'''
+
+    def __init__(self, name, ctype, values, strings=None):
+        self.name = name
+        self.type = ctype
+        self.values = values
+        self.strings = strings
+
+    def __len__(self):
+        return len(self.values)
+
+    def _decode(self, value):
+        if self.type == FLOAT:
+            return None if math.isnan(value) else value
+        if self.type == INT:
+            return None if value == INT_NULL else value
+        if self.type == BOOL:
+            return None if value == -1 else value == 1
+        return None if value == -1 else self.strings[value]
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self._decode(x) for x in self.values[idx]]
+        return self._decode(self.values[idx])
+
+    def __iter__(self):
+        decode = self._decode
+        for value in self.values:
+            yield decode(value)
+
+    def raw(self):
+        '''The stored values, string codes and null markers included'''
+        return self.values
+
+
+class ColumnFile(object):
+
+    '''A column file mapped into memory, rows read back as dicts'''
+
+    def __init__(self, path, columns=None):
+        self.path = path
+        self.cache = {}
+        self.views = []
+        self.f = open(path, 'rb')
+        if os.path.getsize(path) < _HEADER.size:
+            self.f.close()
+            raise ValueError('%s is not a column file' % path)
+        self.mm = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, hlength) = _HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError('%s is not a version %s column file' % (path, VERSION))
+        self.header = json.loads(bytes(self.mm[_HEADER.size:_HEADER.size + hlength]).decode('utf-8'))
+        self.start = _HEADER.size + hlength
+        self.nrows = self.header['nrows']
+        self.swap = self.header['byteorder'] != sys.byteorder
+        self.specs = dict((x['name'], x) for x in self.header['columns'])
+        self.names = [x['name'] for x in self.header['columns']]
+        if columns is not None:
+            missing = [x for x in columns if x not in self.specs]
+            if missing:
+                raise KeyError('%s has no column %s' % (path, ', '.join(missing)))
+            self.names = list(columns)
+
+    def __len__(self):
+        return self.nrows
+
+    def column(self, name):
+        '''The named column, mapped in place the first time it's used'''
+        column = self.cache.get(name)
+        if column is not None:
+            return column
+        spec = self.specs[name]
+        ctype = spec['type']
+        code = 'i' if ctype == STRING else ctype
+        size = array(code).itemsize * self.nrows
+        offset = self.start + spec['offset']
+        if self.swap:
+            values = array(code)
+            values.frombytes(self.mm[offset:offset + size])
+            values.byteswap()
+        else:
+            view = memoryview(self.mm)
+            sliced = view[offset:offset + size]
+            values = sliced.cast(code)
+            # every view has to be let go of before the map can be closed
+            self.views += [values, sliced, view]
+        column = self.cache[name] = Column(name, ctype, values, strings=spec.get('strings'))
+        return column
+
+    def __getitem__(self, idx):
+        if isinstance(idx, str):
+            return self.column(idx)
+        if idx < 0:
+            idx += self.nrows
+        if not 0 <= idx < self.nrows:
+            raise IndexError('row %s out of range' % idx)
+        return dict((name, self.column(name)[idx]) for name in self.names)
+
+    def __iter__(self):
+        names = self.names
+        columns = [self.column(x) for x in names]
+        for values in zip(*columns):
+            yield dict(zip(names, values))
+
+    def close(self):
+        self.cache = {}
+        for view in self.views:
+            view.release()
+        self.views = []
+        self.mm.close()
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+
+# columnar:
+#   A compact binary container for lists of dict rows.
+#
+# Each table is stored column by column. Numbers go into typed arrays,
+# strings are interned into a per-column dictionary and stored as codes,
+# and anything else falls back to json. The key order of every row is
+# kept as an interned "shape" so rows load back exactly as they went in.
+# The whole container is zlib compressed.
+
+import json
+import struct
+import sys
+import zlib
+
+from array import array
+from collections import OrderedDict
+
+
+MAGIC = b'ADTC'
+VERSION = 1
+
+FLOAT = 'd'
+INT = 'q'
+BOOL = 'b'
+STRING = 's'
+JSON = 'j'
+
+_LENGTH = struct.Struct('<Q')
+
+
+def _column_type(values):
+    '''Pick the narrowest column type that holds every non-null value'''
+    vtype = None
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            this = BOOL
+        elif isinstance(value, int):
+            this = INT
+        elif isinstance(value, float):
+            this = FLOAT
+        elif isinstance(value, str):
+            this = STRING
+        else:
+            return JSON
+        if vtype is None:
+            vtype = this
+        elif vtype != this:
+            return JSON
+    if vtype is None:
+        return JSON
+    if vtype == INT and any(x is not None and not -2**63 <= x < 2**63 for x in values):
+        return JSON
+    return vtype
+
+
+def _pack(blob):
+    return _LENGTH.pack(len(blob)) + blob
+
+
+def _unpack(data, offset):
+    (length,) = _LENGTH.unpack_from(data, offset)
+    offset += _LENGTH.size
+    return (data[offset:offset + length], offset + length)
+
+
+def _encode_column(vtype, values):
+    if vtype == JSON:
+        return [json.dumps(values).encode('utf-8')]
+
+    nulls = bytearray(1 if x is None else 0 for x in values)
+    if vtype == FLOAT:
+        data = array('d', (x if x is not None else 0.0 for x in values))
+        return [bytes(nulls), data.tobytes()]
+    if vtype == INT:
+        data = array('q', (x if x is not None else 0 for x in values))
+        return [bytes(nulls), data.tobytes()]
+    if vtype == BOOL:
+        return [bytes(nulls), bytes(bytearray(1 if x else 0 for x in values))]
+
+    # strings are interned, null is code -1
+    strings = OrderedDict()
+    codes = array('i')
+    for value in values:
+        if value is None:
+            codes.append(-1)
+            continue
+        code = strings.get(value)
+        if code is None:
+            code = len(strings)
+            strings[value] = code
+        codes.append(code)
+    return [json.dumps(list(strings.keys())).encode('utf-8'), codes.tobytes()]
+
+
+def _decode_column(vtype, blobs, swap):
+    if vtype == JSON:
+        return json.loads(blobs[0].decode('utf-8'))
+
+    if vtype == STRING:
+        strings = json.loads(blobs[0].decode('utf-8'))
+        codes = array('i')
+        codes.frombytes(blobs[1])
+        if swap:
+            codes.byteswap()
+        return [strings[x] if x >= 0 else None for x in codes]
+
+    nulls = bytearray(blobs[0])
+    if vtype == BOOL:
+        values = [x == 1 for x in bytearray(blobs[1])]
+    else:
+        values = array(vtype)
+        values.frombytes(blobs[1])
+        if swap:
+            values.byteswap()
+        values = values.tolist()
+    return [None if n else v for (n, v) in zip(nulls, values)]
+
+
+def encode_table(rows):
+    '''Serialize a list of dicts to bytes'''
+
+    shapes = OrderedDict()
+    shape_codes = array('i')
+    columns = OrderedDict()
+    for idx,row in enumerate(rows):
+        shape = tuple(row.keys())
+        code = shapes.get(shape)
+        if code is None:
+            code = len(shapes)
+            shapes[shape] = code
+        shape_codes.append(code)
+        for key in shape:
+            if key not in columns:
+                columns[key] = [None] * idx
+            columns[key].append(row[key])
+        for key,values in columns.items():
+            if len(values) <= idx:
+                values.append(None)
+
+    header = {
+        'nrows': len(rows),
+        'byteorder': sys.byteorder,
+        'shapes': [list(x) for x in shapes.keys()],
+        'columns': [],
+    }
+    blobs = []
+    for key,values in columns.items():
+        vtype = _column_type(values)
+        encoded = _encode_column(vtype, values)
+        header['columns'].append([key, vtype, len(encoded)])
+        blobs += encoded
+
+    parts = [_pack(json.dumps(header).encode('utf-8')), _pack(shape_codes.tobytes())]
+    parts += [_pack(x) for x in blobs]
+    return b''.join(parts)
+
+
+def decode_table(data):
+    '''Rebuild the list of dicts that encode_table() serialized'''
+
+    (blob, offset) = _unpack(data, 0)
+    header = json.loads(blob.decode('utf-8'))
+    swap = header['byteorder'] != sys.byteorder
+
+    (blob, offset) = _unpack(data, offset)
+    shape_codes = array('i')
+    shape_codes.frombytes(blob)
+    if swap:
+        shape_codes.byteswap()
+
+    columns = {}
+    for (key, vtype, nblobs) in header['columns']:
+        blobs = []
+        for x in range(nblobs):
+            (blob, offset) = _unpack(data, offset)
+            blobs.append(blob)
+        columns[key] = _decode_column(vtype, blobs, swap)
+
+    shapes = header['shapes']
+    return [
+        dict((key, columns[key][idx]) for key in shapes[code])
+        for (idx, code) in enumerate(shape_codes)
+    ]
+
+
+def dumps(tables, level=6):
+    '''Serialize an ordered mapping of table name -> rows'''
+    parts = [MAGIC, struct.pack('<I', VERSION)]
+    for name,rows in tables.items():
+        parts.append(_pack(name.encode('utf-8')))
+        parts.append(_pack(encode_table(rows)))
+    return zlib.compress(b''.join(parts), level)
+
+
+class TableWriter(object):
+
+    '''Write tables to a binary file one at a time in the dumps() format'''
+
+    def __init__(self, f, level=6):
+        self.f = f
+        self.zobj = zlib.compressobj(level)
+        self.f.write(self.zobj.compress(MAGIC + struct.pack('<I', VERSION)))
+
+    def write_table(self, name, rows):
+        self.f.write(self.zobj.compress(_pack(name.encode('utf-8'))))
+        self.f.write(self.zobj.compress(_pack(encode_table(rows))))
+
+    def close(self):
+        self.f.write(self.zobj.flush())
+
+
+def iter_tables(data):
+    '''Yield the (name, rows) of each table that dumps() wrote'''
+    data = zlib.decompress(data)
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError('not a columnar table file')
+    (version,) = struct.unpack_from('<I', data, len(MAGIC))
+    if version != VERSION:
+        raise ValueError('unsupported columnar version %s' % version)
+
+    offset = len(MAGIC) + 4
+    while offset < len(data):
+        (name, offset) = _unpack(data, offset)
+        (blob, offset) = _unpack(data, offset)
+        yield (name.decode('utf-8'), decode_table(blob))
+
+
+def loads(data):
+    '''Load the tables dumps() wrote back into an OrderedDict'''
+    return OrderedDict(iter_tables(data))
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+
+# hostlanes:
+#   Reduce per host task observations to what a timeline can show.
+#
+# The observations are split by host in one pass, and each host's are cut
+# into one segment per run of the same task. Segments of a host and task
+# that are closer than the timeline can resolve are merged. Every host
+# gets it's own lane until the lanes would be too thin to see, then
+# neighbouring hosts share a lane and each task's merged segments in it
+# carry the fraction of the lane's host time they cover, quantized to a
+# few levels. The size of the drawing then follows the pixels it has and
+# not the number of hosts and tasks.
+
+import math
+
+from collections import OrderedDict
+
+
+# fill levels a shared lane's blocks are quantized to
+LEVELS = 8
+
+
+def iter_observations(obs):
+    '''(ts, host, task_name) for observation dicts or a ColumnFile'''
+    if hasattr(obs, 'column'):
+        # the columns decode faster than the rows get built
+        return zip(obs.column('ts'), obs.column('host'), obs.column('task_name'))
+    return ((x.get('ts'), x.get('host'), x.get('task_name')) for x in obs)
+
+
+def group_by_host(obs):
+    '''host -> [(ts, task_name)] and task_name -> first ts, in one pass
+
+    Only hosts whose name starts with a letter are kept, the rest are
+    addresses and noise picked up from the logs.
+    '''
+    hosts = {}
+    tasks = OrderedDict()
+    for (ts, host, task) in iter_observations(obs):
+        if ts is None or not task:
+            continue
+        if task not in tasks:
+            tasks[task] = ts
+        if not host or not host[0].isalpha():
+            continue
+        events = hosts.get(host)
+        if events is None:
+            events = hosts[host] = []
+        events.append((ts, task))
+    for events in hosts.values():
+        events.sort(key=lambda x: x[0])
+    return (hosts, tasks)
+
+
+def host_order(hosts):
+    '''The hosts in the order they were first seen'''
+    return sorted(hosts, key=lambda x: (hosts[x][0][0], x))
+
+
+def merge_segments(segments, mingap=0.0):
+    '''Merge (start, stop) segments that overlap or are mingap apart'''
+    merged = []
+    for (start, stop) in sorted(segments):
+        if merged and start - merged[-1][1] <= mingap:
+            if stop > merged[-1][1]:
+                merged[-1][1] = stop
+        else:
+            merged.append([start, stop])
+    return [tuple(x) for x in merged]
+
+
+def host_segments(events, mingap=0.0):
+    '''task_name -> merged [(start, stop)] for one host's sorted events
+
+    A segment runs from the first to the last of a run of observations of
+    the same task.
+    '''
+    tasks = OrderedDict()
+    current = None
+    for (ts, task) in events:
+        if current is not None and current[0] == task:
+            current[2] = ts
+            continue
+        current = [task, ts, ts]
+        tasks.setdefault(task, []).append(current)
+    return OrderedDict(
+        (task, merge_segments([(x[1], x[2]) for x in runs], mingap=mingap))
+        for (task, runs) in tasks.items()
+    )
+
+
+def build_lanes(hosts, hostnames, nlanes, mingap=0.0, levels=LEVELS):
+    '''([[hostname]] per lane, [(task_name, level, lane, start, stop)])
+
+    With as many lanes as hosts every block is a host's own segment at
+    the top level. Otherwise each lane holds consecutive hosts, and a
+    block's level says how much of it the lane's hosts spent in the task.
+    '''
+    per_lane = max(1, int(math.ceil(len(hostnames) / float(max(1, nlanes)))))
+    lanes = [hostnames[x:x + per_lane] for x in range(0, len(hostnames), per_lane)]
+
+    blocks = []
+    for (idl, lane) in enumerate(lanes):
+        segments = OrderedDict()
+        for hn in lane:
+            for (task, hsegments) in host_segments(hosts[hn], mingap=mingap).items():
+                segments.setdefault(task, []).extend(hsegments)
+
+        for (task, tsegments) in segments.items():
+            if len(lane) == 1:
+                for (start, stop) in tsegments:
+                    blocks.append((task, levels, idl, start, stop))
+                continue
+
+            tsegments.sort()
+            idx = 0
+            for (start, stop) in merge_segments(tsegments, mingap=mingap):
+                # the host segments are sorted, so each union takes the next few
+                busy = 0.0
+                count = 0
+                while idx < len(tsegments) and tsegments[idx][0] <= stop:
+                    busy += tsegments[idx][1] - tsegments[idx][0]
+                    count += 1
+                    idx += 1
+                if stop > start:
+                    fraction = busy / ((stop - start) * len(lane))
+                else:
+                    fraction = count / float(len(lane))
+                level = min(levels, max(1, int(math.ceil(fraction * levels))))
+                blocks.append((task, level, idl, start, stop))
+
+    return (lanes, blocks)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+# logcache:
+#   A size capped directory of parsed log results.
+#
+# Entries are keyed on the path, size and nanosecond mtime of every input
+# plus a hash of it's first and last 64KiB, so finding an entry reads a
+# bounded amount of each log however large it is. Any write that changes
+# the size, the mtime or either end of a log misses the cache. Loading an
+# entry refreshes its mtime and the least recently used entries are
+# removed whenever the directory grows past it's cap.
+
+import glob
+import hashlib
+import os
+import tempfile
+
+
+CACHE_SUFFIX = '.adtc'
+DEFAULT_CACHE_MB = 1024
+
+# bytes hashed from each end of an input
+FINGERPRINT_BYTES = 64 * 1024
+
+
+def fingerprint(filename, size, nbytes=FINGERPRINT_BYTES):
+    '''sha1 of the first and last nbytes of a file'''
+    sha = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        sha.update(f.read(nbytes))
+        if size > nbytes:
+            f.seek(max(nbytes, size - nbytes))
+            sha.update(f.read(nbytes))
+    return sha.hexdigest()
+
+
+class LogCache(object):
+
+    def __init__(self, cachedir, max_bytes=DEFAULT_CACHE_MB * 1024 * 1024):
+        self.cachedir = cachedir
+        self.max_bytes = max_bytes
+
+    def key(self, filenames, *extra):
+        '''Fingerprint a set of input files plus any options that shape the result'''
+        sha = hashlib.sha1()
+        for fn in filenames:
+            st = os.stat(fn)
+            sha.update(('%s\0%s\0%s\0%s\0' % (
+                os.path.abspath(fn),
+                st.st_size,
+                st.st_mtime_ns,
+                fingerprint(fn, st.st_size)
+            )).encode('utf-8'))
+        for x in extra:
+            sha.update(('%s\0' % (x,)).encode('utf-8'))
+        return sha.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cachedir, key + CACHE_SUFFIX)
+
+    def load(self, key):
+        '''Return the cached bytes for a key or None'''
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            data = f.read()
+        # loading counts as a use for the lru
+        os.utime(path, None)
+        return data
+
+    def store(self, key, data):
+        '''Atomically write an entry and then trim the cache to size'''
+        if not os.path.exists(self.cachedir):
+            os.makedirs(self.cachedir)
+        (fd, tmp) = tempfile.mkstemp(dir=self.cachedir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.rename(tmp, self.path(key))
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self.evict(keep=key)
+
+    def invalidate(self, key):
+        path = self.path(key)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def evict(self, keep=None):
+        '''Remove the least recently used entries until under the cap'''
+        entries = []
+        for path in glob.glob(os.path.join(self.cachedir, '*' + CACHE_SUFFIX)):
+            st = os.stat(path)
+            entries.append((st.st_mtime, st.st_size, path))
+        entries.sort()
+
+        total = sum(x[1] for x in entries)
+        for (mtime, size, path) in entries:
+            if total <= self.max_bytes:
+                break
+            if keep is not None and path == self.path(keep):
+                continue
+            os.remove(path)
+            total -= size
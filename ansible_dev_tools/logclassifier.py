@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+
+# logclassifier:
+#   Identify the lines of ansible's debug stdout and syslog outputs.
+#
+# Every pattern is compiled once at import and each line is routed by it's
+# first character to a handler that only runs the regexes that could match.
+# Cheap substring checks gate each regex so that most lines are classified
+# with a single match, and that match also yields the fields of the record.
+
+import re
+
+from collections import namedtuple
+
+
+# record kinds
+SCHEMA_48378 = 'schema48378'
+PYLOG = 'pylog'
+EXECUTOR_START = 'executor_start'
+EXECUTOR_STOP = 'executor_stop'
+PLAYBOOK_HEADER = 'playbook_header'
+PLAY_HEADER = 'play_header'
+TASK_HEADER = 'task_header'
+SSH_EXEC = 'ssh_exec'
+HOST_LINE = 'host_line'
+PID_LINE = 'pid_line'
+
+# the kinds that come from python logging (ANSIBLE_LOG_PATH) entries
+PYLOG_KINDS = (PYLOG, EXECUTOR_START, EXECUTOR_STOP)
+
+LogRecord = namedtuple('LogRecord', ['kind', 'pid', 'ts', 'host', 'name', 'uuid'])
+
+
+#   9820 1542665612.30418: Adding handler ...
+#   5128 1543680532.73490 [None]: in run() - task f45c89b5-...
+INDENTED_RE = re.compile(r'^\s+(\d+) (\d+\.\d+)(?: \[([^\]]*)\])?:')
+SCHEMA_48378_RE = re.compile(r'\s(\d+) (\d+\.\d+) \[([^\]]*)\]:')
+PID_TS_RE = re.compile(r'(?:^|\s)(\d+) (\d+\.\d+):')
+
+# 2018-10-12 01:29:39,173 p=5489 u=vagrant |    7705 1539307779.17295: ...
+PYLOG_PREFIX_RE = re.compile(r'^(\S+) (\S+) p=(\d+) u=(\S+) \|')
+PYLOG_PID_RE = re.compile(r'p=(\d+)')
+PYLOG_LEAD_RE = re.compile(r'\S+ \S+ p=(\d+) u=\S+ \|\s*(?:(\d+) (\d+\.\d+):)?')
+EXECUTOR_RE = re.compile(
+    r'(\d+) (\d+\.\d+): (done )?running TaskExecutor\(\) for ([^/\s]*)/\S*[ \t]*(.*)$'
+)
+EXECUTOR_TAIL_RE = re.compile(r' (done )?running TaskExecutor\(\) for ([^/\s]*)/\S*[ \t]*(.*)$')
+
+PLAYBOOK_HEADER_RE = re.compile(r'^PLAYBOOK: (.*?)\s*\*')
+PLAY_HEADER_RE = re.compile(r'\[(.*)\]')
+TASK_HEADER_RE = re.compile(r'(?<=TASK \[).*?(?=\])')
+
+HOST_LINE_RE = re.compile(r'<([^>]*)> \(')
+SSH_OPTION_RE = re.compile(r'(\w+)=([^ ]*)(?= )')
+
+# the context markers inside of 48378 entries
+MARKER_PLAYBOOK_RE = re.compile(r'PLAYBOOK: (.*) \*')
+MARKER_PLAY_RE = re.compile(r'PLAY \[(.*)\]')
+MARKER_TASK_RE = re.compile(r'TASK: (.*)')
+MARKER_TASK_UUID_RE = re.compile(r'in run\(\) - task .*?(\S+)\s*$')
+MARKER_MODULE_RE = re.compile(r'Using module file (.*)')
+
+
+def _classify_pylog(line):
+    # the common case, a single entry right behind the logging prefix
+    m = PYLOG_LEAD_RE.match(line)
+    if m is not None and m.group(2) is not None:
+        pid = int(m.group(2))
+        ts = float(m.group(3))
+        if 'TaskExecutor()' in line:
+            e = EXECUTOR_TAIL_RE.match(line, m.end())
+            if e is not None:
+                return _executor_record(pid, ts, e.group(1), e.group(2), e.group(3))
+        else:
+            return LogRecord(PYLOG, pid, ts, None, None, None)
+
+    # mixed or truncated entries need a scan of the whole line
+    if 'TaskExecutor()' in line:
+        e = EXECUTOR_RE.search(line)
+        if e is not None:
+            return _executor_record(int(e.group(1)), float(e.group(2)), e.group(3), e.group(4), e.group(5))
+
+    if m is not None:
+        if m.group(2) is not None:
+            return LogRecord(PYLOG, int(m.group(2)), float(m.group(3)), None, None, None)
+        return LogRecord(PYLOG, int(m.group(1)), None, None, None, None)
+
+    m = PID_TS_RE.search(line)
+    if m is not None:
+        return LogRecord(PYLOG, int(m.group(1)), float(m.group(2)), None, None, None)
+
+    m = PYLOG_PID_RE.search(line)
+    if m is not None:
+        return LogRecord(PYLOG, int(m.group(1)), None, None, None, None)
+    return LogRecord(PYLOG, None, None, None, None, None)
+
+
+def _executor_record(pid, ts, done, host, task):
+    if done:
+        kind = EXECUTOR_STOP
+    else:
+        kind = EXECUTOR_START
+    (task, uuid) = _split_task_uuid(task)
+    return LogRecord(kind, pid, ts, host, task, uuid)
+
+
+def _classify_other(line):
+    if 'p=' in line and 'u=' in line:
+        return _classify_pylog(line)
+
+    if 'SSH: EXEC' in line:
+        # <HOSTNAME> SSH: EXEC ssh -vvv -C -o ...
+        host = line.split(None, 1)[0].replace('<', '').replace('>', '')
+        return LogRecord(SSH_EXEC, None, None, host, None, None)
+
+    if '> (' in line:
+        m = HOST_LINE_RE.search(line)
+        if m is not None:
+            return LogRecord(HOST_LINE, None, None, m.group(1), None, None)
+
+    if ':' in line:
+        m = PID_TS_RE.search(line)
+        if m is not None:
+            return LogRecord(PID_LINE, int(m.group(1)), float(m.group(2)), None, None, None)
+
+    return None
+
+
+def _classify_indented(line):
+    m = INDENTED_RE.match(line)
+    if m is None:
+        return _classify_other(line)
+
+    if m.group(3) is not None:
+        # https://github.com/ansible/ansible/pull/48378
+        host = m.group(3)
+        if host == 'None':
+            host = None
+        return LogRecord(SCHEMA_48378, int(m.group(1)), float(m.group(2)), host, None, None)
+
+    # the rarer kinds win over a plain pid line
+    if ('p=' in line and 'u=' in line) or 'SSH: EXEC' in line or '> (' in line:
+        return _classify_other(line)
+
+    return LogRecord(PID_LINE, int(m.group(1)), float(m.group(2)), None, None, None)
+
+
+def _classify_header(line):
+    if 'p=' in line and 'u=' in line:
+        return _classify_pylog(line)
+
+    if line.startswith('PLAYBOOK'):
+        if line.startswith('PLAYBOOK:') or line.startswith('PLAYBOOK '):
+            m = PLAYBOOK_HEADER_RE.match(line)
+            return LogRecord(PLAYBOOK_HEADER, None, None, None, m and m.group(1), None)
+
+    elif line.startswith('PLAY '):
+        m = PLAY_HEADER_RE.search(line)
+        return LogRecord(PLAY_HEADER, None, None, None, m and m.group(1), None)
+
+    elif line.startswith('TASK'):
+        m = TASK_HEADER_RE.search(line)
+        return LogRecord(TASK_HEADER, None, None, None, m and m.group(0), None)
+
+    return _classify_other(line)
+
+
+# route by the first character so each line only meets the patterns it could match
+_DISPATCH = {
+    ' ': _classify_indented,
+    '\t': _classify_indented,
+    'P': _classify_header,
+    'T': _classify_header,
+}
+
+
+def classify_line(line):
+    '''Identify a line from ansible's debug output as a LogRecord
+
+    Returns None for lines that none of the parsers care about. TaskExecutor
+    entries are only split out of python logging lines, on stdout they are
+    plain pid lines just like every other debug message.
+    '''
+    return _DISPATCH.get(line[:1], _classify_other)(line)
+
+
+def classify_48378_line(line):
+    '''Identify a line of a log that only holds 48378 style entries'''
+    m = SCHEMA_48378_RE.search(line)
+    if m is None:
+        return None
+    host = m.group(3)
+    if host == 'None':
+        host = None
+    return LogRecord(SCHEMA_48378, int(m.group(1)), float(m.group(2)), host, None, None)
+
+
+def split_48378_marker(line):
+    '''Find the playbook context a 48378 entry announces
+
+    Returns a (field, value) tuple where field is one of playbook, play, task,
+    task_uuid or module. The value is None if the marker was seen but the
+    name could not be parsed from it.
+    '''
+
+    # 5128 1543680532.73490 [None]: in run() - task f45c89b5-63bd-c3ea-c4db-000000000011
+    if 'PLAY' in line:
+        if 'PLAYBOOK:' in line:
+            m = MARKER_PLAYBOOK_RE.search(line)
+            return ('playbook', m and m.group(1).replace('*', '').strip())
+        m = MARKER_PLAY_RE.search(line)
+        return ('play', m and m.group(1).replace('[', '').replace(']', '').strip())
+
+    if 'TASK:' in line:
+        m = MARKER_TASK_RE.search(line)
+        return ('task', m and m.group(1).strip())
+
+    if 'in run() - task' in line:
+        m = MARKER_TASK_UUID_RE.search(line)
+        if m is not None:
+            return ('task_uuid', m.group(1))
+        return None
+
+    if 'Using module file' in line:
+        m = MARKER_MODULE_RE.search(line)
+        if m is not None:
+            return ('module', m.group(1).strip())
+
+    return None
+
+
+def _split_task_uuid(task):
+    parts = task.split()
+    if parts and parts[-1].startswith('[') and parts[-1].endswith(']'):
+        return (' '.join(parts[:-1]), parts[-1].replace('[', '').replace(']', ''))
+    return (' '.join(parts), None)
+
+
+def split_executor_line(line):
+    '''Chop all of the info from a taskexecutor log entry'''
+
+    # 2018-10-12 01:29:39,173 p=5489 u=vagrant |    7705 1539307779.17295:
+    #   running TaskExecutor() for sshd_145/TASK: Check for /usr/local/sync (Target Directory)
+    # 2018-10-12 01:29:39,654 p=5489 u=vagrant |    7591 1539307779.65405:
+    #   done running TaskExecutor() for sshd_60/TASK: Check for /usr/local/sync (Target Directory) [525400a6-0421-65e9-9a84-000000000032]
+    # 5502 1539307714.25537: done running TaskExecutor() for sshd_250/TASK: wipe out the rules [525400a6-0421-65e9-9a84-00000000002e]
+
+    date = None
+    time = None
+    ppid = None
+    uid = None
+    m = PYLOG_PREFIX_RE.match(line)
+    if m is not None:
+        (date, time, ppid, uid) = m.groups()
+        ppid = int(ppid)
+
+    pid = None
+    ts = None
+    host = None
+    task = None
+    uuid = None
+    m = EXECUTOR_RE.search(line)
+    if m is not None:
+        pid = int(m.group(1))
+        ts = float(m.group(2))
+        host = m.group(4)
+        (task, uuid) = _split_task_uuid(m.group(5))
+
+    return {
+        'date': date,
+        'time': time,
+        'ts': ts,
+        'ppid': ppid,
+        'pid': pid,
+        'uid': uid,
+        'uuid': uuid,
+        'host': host,
+        'task': task
+    }
+
+
+def split_ssh_exec(line):
+    '''Chop all of the info out of an ssh connection string'''
+
+    # <dockerhost> SSH: EXEC sshpass -d90 ssh -vvv -C -o ControlMaster=auto
+    #   -o ControlPersist=60s -o StrictHostKeyChecking=no -o Port=33017
+    #   -o User=root -o ConnectTimeout=10 -o ControlPath=/home/vagrant/.ansible/cp/da9b210846
+    #   dockerhost '/bin/sh -c '"'"'echo ~root && sleep 0'"'"''
+
+    hostname = line.split(None, 1)[0].replace('<', '').replace('>', '')
+
+    # one scan for every key=value option, the first of each wins
+    options = {}
+    for (key, value) in SSH_OPTION_RE.findall(line):
+        if key not in options:
+            options[key] = value
+
+    return {
+        'hostname': hostname,
+        'hostkey_checking': options.get('StrictHostKeyChecking', '').lower() != 'no',
+        'port': options.get('Port'),
+        'user': options.get('User'),
+        'cp': '-o ControlMaster=' in line,
+        'cp_path': options.get('ControlPath'),
+        'sshpass': 'sshpass' in line,
+        'timeout': options.get('ConnectTimeout'),
+    }
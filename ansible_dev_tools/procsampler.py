@@ -0,0 +1,491 @@
+#!/usr/bin/env python
+
+# procsampler:
+#   Sample /proc during a run and write the samples out as ndjson.
+#
+# This replaces the vmstat, top and /proc/net/dev loggers julian used to
+# start. Everything those printed comes from a handful of /proc files, so a
+# single python process reads them directly at whatever interval is asked
+# for and writes one json object per sample that delphiki loads as is.
+#
+# The files stay open and are re-read with pread, which has the kernel
+# regenerate them without a path lookup or an open per sample. Per process
+# stats are only kept for the run's own process tree, a pid whose stat is
+# byte for byte the same as last time is not parsed again or written out,
+# and pids outside of the tree are never opened again.
+#
+# Each process also gets one "pid" record once it's gone (or when sampling
+# stops) with it's cpu time, peak rss, context switches and io, as they
+# were the last time it was seen. A process that comes and goes between
+# two samples is never seen, but it's cpu time still shows up in it's
+# parent's children_utime and children_stime once the parent reaps it.
+
+import argparse
+import json
+import os
+import resource
+import signal
+import socket
+import sys
+import time
+
+
+PROC = '/proc'
+
+# /proc/stat cpu line: user nice system idle iowait irq softirq steal
+CPU_FIELDS = ['user', 'nice', 'system', 'idle', 'iowait', 'irq', 'softirq', 'steal']
+
+# the meminfo lines vmstat and top report on, in kB
+MEMINFO_FIELDS = [
+    'MemTotal', 'MemFree', 'MemAvailable', 'Buffers', 'Cached',
+    'SReclaimable', 'SwapTotal', 'SwapFree',
+]
+
+# fields of /proc/<pid>/stat after the ")" closing the command name
+STAT_STATE = 0
+STAT_PPID = 1
+STAT_UTIME = 11
+STAT_STIME = 12
+STAT_CUTIME = 13
+STAT_CSTIME = 14
+STAT_STARTTIME = 19
+STAT_RSS = 21
+
+READ_SIZE = 65536
+
+# descriptors left for everything else once the pid stat files are open
+RESERVED_FDS = 64
+
+# /proc/<pid>/status and /proc/<pid>/io lines kept for the pid records
+STATUS_FIELDS = {
+    'VmHWM': 'peak_rss_kb',
+    'voluntary_ctxt_switches': 'voluntary_ctxt_switches',
+    'nonvoluntary_ctxt_switches': 'nonvoluntary_ctxt_switches',
+}
+IO_FIELDS = {
+    'rchar': 'io_read_bytes',
+    'wchar': 'io_write_bytes',
+    'read_bytes': 'disk_read_bytes',
+    'write_bytes': 'disk_write_bytes',
+}
+
+
+def parse_cpu(text):
+    '''The system wide counters of /proc/stat'''
+    data = {}
+    for line in text.splitlines():
+        (key, sep, rest) = line.partition(' ')
+        if key == 'cpu':
+            data['cpu'] = [int(x) for x in rest.split()[:len(CPU_FIELDS)]]
+        elif key in ('ctxt', 'btime', 'procs_running', 'procs_blocked'):
+            data[key] = int(rest)
+        elif key == 'intr':
+            # only the total, the per irq counts are most of the file
+            data[key] = int(rest.split(None, 1)[0])
+    return data
+
+
+def parse_meminfo(text):
+    '''The MEMINFO_FIELDS of /proc/meminfo in kB'''
+    data = {}
+    for line in text.splitlines():
+        (key, sep, rest) = line.partition(':')
+        if key in MEMINFO_FIELDS:
+            data[key] = int(rest.split()[0])
+    return data
+
+
+def parse_loadavg(text):
+    '''([load_1, load_5, load_15], running tasks, total tasks)'''
+    cols = text.split()
+    (running, total) = cols[3].split('/')
+    return ([float(x) for x in cols[:3]], int(running), int(total))
+
+
+def parse_netdev(text):
+    '''{interface: [rx bytes, rx packets, tx bytes, tx packets]}'''
+    data = {}
+    for line in text.splitlines():
+        (iface, sep, rest) = line.partition(':')
+        if not sep or '|' in iface:
+            continue
+        cols = rest.split()
+        data[iface.strip()] = [int(cols[0]), int(cols[1]), int(cols[8]), int(cols[9])]
+    return data
+
+
+def parse_pid_stat(raw):
+    '''(comm, fields after the comm) out of a /proc/<pid>/stat'''
+    # the command can have spaces and parens in it
+    (head, sep, tail) = raw.rpartition(b')')
+    if not sep:
+        return None
+    return (head.partition(b'(')[2].decode('utf-8', 'replace'), tail.split())
+
+
+def parse_usage(text, fields):
+    '''{name: int} for the "key: value" lines of status or io named in fields'''
+    data = {}
+    for line in text.splitlines():
+        (key, sep, rest) = line.partition(':')
+        name = fields.get(key)
+        if name is not None:
+            data[name] = int(rest.split()[0])
+    return data
+
+
+def pread_all(fd):
+    '''The whole of a /proc file through an already open descriptor'''
+    data = os.pread(fd, READ_SIZE, 0)
+    while len(data) % READ_SIZE == 0 and data:
+        more = os.pread(fd, READ_SIZE, len(data))
+        if not more:
+            break
+        data += more
+    return data
+
+
+def read_proc_file(pid, name, proc=PROC):
+    try:
+        with open(os.path.join(proc, str(pid), name), 'rb') as f:
+            return f.read()
+    except (IOError, OSError):
+        return None
+
+
+def read_argv(pid, proc=PROC):
+    data = read_proc_file(pid, 'cmdline', proc=proc)
+    if not data:
+        return []
+    return data.rstrip(b'\0').decode('utf-8', 'replace').split('\0')
+
+
+def list_pids(proc=PROC):
+    return [int(x) for x in os.listdir(proc) if x.isdigit()]
+
+
+class TrackedPid(object):
+
+    __slots__ = ('pid', 'fd', 'path', 'raw', 'fields', 'argv', 'usage', 'seen')
+
+    def __init__(self, pid, fd, path, raw, fields):
+        self.pid = pid
+        self.fd = fd
+        self.path = path
+        self.raw = raw
+        self.fields = fields
+        self.argv = []
+        self.usage = {}
+        # when the process was last seen alive
+        self.seen = None
+
+    def read(self):
+        '''The current stat, None once the process is gone'''
+        try:
+            if self.fd is None:
+                with open(self.path, 'rb') as f:
+                    return f.read()
+            return os.pread(self.fd, 4096, 0)
+        except (IOError, OSError):
+            return None
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class ProcSampler(object):
+
+    '''Write a sample of /proc every interval seconds to an open file
+
+    With a root pid, only that pid and it's descendants get per process
+    stats, otherwise every pid does.
+    '''
+
+    def __init__(self, f, interval=1.0, root=None, proc=PROC):
+        self.f = f
+        self.interval = interval
+        self.root = root
+        self.proc = proc
+        self.nsamples = 0
+        self.running = True
+        self.mono0 = time.monotonic()
+        self.wall0 = time.time()
+        self.fds = {}
+        for name in ('stat', 'meminfo', 'loadavg', 'net/dev'):
+            try:
+                self.fds[name] = os.open(os.path.join(proc, name), os.O_RDONLY)
+            except OSError:
+                self.fds[name] = None
+        self.maxfds = resource.getrlimit(resource.RLIMIT_NOFILE)[0] - RESERVED_FDS
+        self.clock_ticks = float(os.sysconf('SC_CLK_TCK'))
+        self.page_kb = os.sysconf('SC_PAGE_SIZE') // 1024
+        self.boot = self.boot_time()
+        self.tracked = {}
+        # pids that were seen outside of the root's tree
+        self.ignored = set()
+
+    def boot_time(self):
+        '''The epoch the pid start times count from
+
+        btime in /proc/stat is only to the second, uptime is to the tick.
+        '''
+        try:
+            with open(os.path.join(self.proc, 'uptime'), 'r') as f:
+                uptime = float(f.read().split()[0])
+        except (IOError, OSError, ValueError, IndexError):
+            return float(parse_cpu(self.read('stat')).get('btime', 0))
+        return self.wall0 - (time.monotonic() - self.mono0) - uptime
+
+    def now(self):
+        '''epoch time that never steps backwards during the capture'''
+        mono = time.monotonic()
+        return (mono, self.wall0 + (mono - self.mono0))
+
+    def write(self, record):
+        self.f.write(json.dumps(record, separators=(',', ':')) + '\n')
+        self.f.flush()
+
+    def read(self, name):
+        fd = self.fds.get(name)
+        if fd is None:
+            return ''
+        return pread_all(fd).decode('utf-8', 'replace')
+
+    def header(self):
+        self.write({
+            'kind': 'header',
+            'ts': self.wall0,
+            'mono': self.mono0,
+            'interval': self.interval,
+            'root': self.root,
+            'hostname': socket.gethostname(),
+            'timezone': time.strftime('%Z'),
+            'clock_ticks': self.clock_ticks,
+            'page_size': os.sysconf('SC_PAGE_SIZE'),
+            'cpu_fields': CPU_FIELDS,
+        })
+
+    def open_pid(self, pid, nopen):
+        '''Start tracking a pid, keeping it's stat open if nopen leaves room'''
+        path = os.path.join(self.proc, str(pid), 'stat')
+        fd = None
+        try:
+            if nopen < self.maxfds:
+                fd = os.open(path, os.O_RDONLY)
+                raw = os.pread(fd, 4096, 0)
+            else:
+                with open(path, 'rb') as f:
+                    raw = f.read()
+        except (IOError, OSError):
+            if fd is not None:
+                os.close(fd)
+            return None
+        parsed = parse_pid_stat(raw)
+        if parsed is None:
+            if fd is not None:
+                os.close(fd)
+            return None
+        return TrackedPid(pid, fd, path, raw, parsed)
+
+    def counters(self, tracked):
+        (comm, fields) = tracked.fields
+        return [
+            int(fields[STAT_PPID]),
+            fields[STAT_STATE].decode('ascii'),
+            int(fields[STAT_UTIME]),
+            int(fields[STAT_STIME]),
+            int(fields[STAT_RSS]),
+            comm,
+        ]
+
+    def read_usage(self, tracked):
+        '''Fold the pid's current status and io into what was seen before'''
+        usage = tracked.usage
+        current = {}
+        for (name, fields) in (('status', STATUS_FIELDS), ('io', IO_FIELDS)):
+            data = read_proc_file(tracked.pid, name, proc=self.proc)
+            if data is not None:
+                current.update(parse_usage(data.decode('utf-8', 'replace'), fields))
+        current['peak_rss_kb'] = max(
+            current.get('peak_rss_kb', 0),
+            int(tracked.fields[1][STAT_RSS]) * self.page_kb
+        )
+        # a zombie's status no longer has any memory in it
+        for (key, value) in current.items():
+            if value > usage.get(key, -1):
+                usage[key] = value
+
+    def pid_record(self, tracked, exited=True):
+        '''The totals for a process as of the last time it was seen'''
+        (comm, fields) = tracked.fields
+        ticks = self.clock_ticks
+        record = {
+            'kind': 'pid',
+            'pid': tracked.pid,
+            'ppid': int(fields[STAT_PPID]),
+            'comm': comm,
+            'cmd': ' '.join(tracked.argv) or comm,
+            'argv': tracked.argv,
+            'start': self.boot + int(fields[STAT_STARTTIME]) / ticks,
+            'seen': tracked.seen,
+            'exited': exited,
+            'utime': int(fields[STAT_UTIME]) / ticks,
+            'stime': int(fields[STAT_STIME]) / ticks,
+            'children_utime': int(fields[STAT_CUTIME]) / ticks,
+            'children_stime': int(fields[STAT_CSTIME]) / ticks,
+        }
+        record.update(tracked.usage)
+        return record
+
+    def sample_pids(self, ts):
+        '''(changed pids, new pids' command lines, pids that went away)'''
+        alive = list_pids(self.proc)
+        aliveset = set(alive)
+        changed = {}
+        gone = []
+        for (pid, tracked) in list(self.tracked.items()):
+            raw = tracked.read() if pid in aliveset else None
+            if raw is None:
+                tracked.close()
+                self.tracked.pop(pid)
+                gone.append(tracked)
+                continue
+            tracked.seen = ts
+            if raw != tracked.raw:
+                parsed = parse_pid_stat(raw)
+                if parsed is not None:
+                    tracked.raw = raw
+                    tracked.fields = parsed
+                    changed[pid] = self.counters(tracked)
+                    self.read_usage(tracked)
+
+        self.ignored &= aliveset
+        me = os.getpid()
+        candidates = {}
+        for pid in alive:
+            if pid in self.tracked or pid in self.ignored or pid == me:
+                continue
+            tracked = self.open_pid(pid, len(self.tracked) + len(candidates))
+            if tracked is not None:
+                candidates[pid] = tracked
+
+        # a pid is in the tree if it's parent is, and never the reverse
+        if self.root is None:
+            added = list(candidates)
+        else:
+            added = []
+            pending = dict(candidates)
+            if self.root in pending:
+                added.append(self.root)
+                pending.pop(self.root)
+            while pending:
+                found = [
+                    x for (x, y) in pending.items()
+                    if int(y.fields[1][STAT_PPID]) in self.tracked or int(y.fields[1][STAT_PPID]) in added
+                ]
+                if not found:
+                    break
+                for pid in found:
+                    added.append(pid)
+                    pending.pop(pid)
+            for (pid, tracked) in pending.items():
+                tracked.close()
+                self.ignored.add(pid)
+
+        new = {}
+        for pid in added:
+            tracked = self.tracked[pid] = candidates[pid]
+            tracked.seen = ts
+            tracked.argv = read_argv(pid, proc=self.proc)
+            new[pid] = ' '.join(tracked.argv) or tracked.fields[0]
+            changed[pid] = self.counters(tracked)
+            self.read_usage(tracked)
+
+        return (changed, new, gone)
+
+    def sample(self):
+        (mono, ts) = self.now()
+        record = parse_cpu(self.read('stat'))
+        (record['load'], running, record['tasks']) = parse_loadavg(self.read('loadavg'))
+        record['mem'] = parse_meminfo(self.read('meminfo'))
+        record['net'] = parse_netdev(self.read('net/dev'))
+        (record['pids'], record['new'], gone) = self.sample_pids(ts)
+        record['gone'] = [x.pid for x in gone]
+        record['kind'] = 'sample'
+        record['mono'] = mono
+        record['ts'] = ts
+        self.write(record)
+        self.nsamples += 1
+        for tracked in gone:
+            self.write(self.pid_record(tracked))
+
+    def finish_pids(self):
+        '''pid records for the processes still running when sampling stops'''
+        for tracked in self.tracked.values():
+            self.write(self.pid_record(tracked, exited=False))
+
+    def footer(self):
+        (mono, ts) = self.now()
+        times = os.times()
+        self.write({
+            'kind': 'footer',
+            'ts': ts,
+            'mono': mono,
+            'samples': self.nsamples,
+            # what the sampler itself cost, to compare against the old loggers
+            'cpu_seconds': times[0] + times[1],
+        })
+
+    def stop(self, *args):
+        self.running = False
+
+    def close(self):
+        for tracked in self.tracked.values():
+            tracked.close()
+        self.tracked = {}
+        for fd in self.fds.values():
+            if fd is not None:
+                os.close(fd)
+        self.fds = {}
+
+    def run(self, duration=None):
+        self.header()
+        deadline = self.mono0
+        try:
+            while self.running:
+                self.sample()
+                if duration is not None and time.monotonic() - self.mono0 >= duration:
+                    break
+                # sleep to the next tick rather than for the interval, so
+                # the time spent sampling doesn't drift the schedule
+                deadline += self.interval
+                delay = deadline - time.monotonic()
+                if delay < 0:
+                    deadline = time.monotonic()
+                    delay = 0
+                time.sleep(delay)
+        finally:
+            self.finish_pids()
+            self.footer()
+            self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='sample /proc to an ndjson file')
+    parser.add_argument('--interval', type=float, default=1.0, help="seconds between samples")
+    parser.add_argument('--root', type=int, help="only sample the processes under this pid")
+    parser.add_argument('--duration', type=float, help="stop after this many seconds")
+    parser.add_argument('dest', help="file to write the samples to")
+    args = parser.parse_args(argv)
+
+    with open(args.dest, 'w') as f:
+        sampler = ProcSampler(f, interval=args.interval, root=args.root)
+        signal.signal(signal.SIGTERM, sampler.stop)
+        signal.signal(signal.SIGINT, sampler.stop)
+        sampler.run(duration=args.duration)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
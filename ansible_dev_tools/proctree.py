@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+# proctree:
+#   A process tree built from fork/clone events.
+#
+# The tree is kept as nested OrderedDicts of pid -> children, which is the
+# shape the asciitree, json and pickle outputs have always had, plus a
+# pid -> node map and a pid -> parent map. Adding a child or finding any
+# pid is a dict lookup instead of a search of the whole tree.
+
+import json
+import pickle
+
+from collections import OrderedDict
+
+
+class ProcessTree(object):
+
+    def __init__(self):
+        self.roots = OrderedDict()
+        self.nodes = {}
+        self.parents = {}
+
+    @classmethod
+    def from_dict(cls, pidmap):
+        '''Wrap an existing nested pid -> children dict'''
+        tree = cls()
+        tree.roots = pidmap
+        # the first occurrence of a pid in preorder wins
+        for (pid, ppid, node) in tree._iter_nodes():
+            if pid not in tree.nodes:
+                tree.nodes[pid] = node
+                tree.parents[pid] = ppid
+        return tree
+
+    def __contains__(self, pid):
+        return pid in self.nodes
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def is_root(self, pid):
+        return pid in self.roots
+
+    def add_root(self, pid):
+        '''Add a top level pid, returns it's node'''
+        node = self.roots.get(pid)
+        if node is None:
+            node = self.roots[pid] = OrderedDict()
+            if pid not in self.nodes:
+                self.nodes[pid] = node
+                self.parents[pid] = None
+        return node
+
+    def add_child(self, ppid, pid):
+        '''Add pid under ppid, which must already be in the tree'''
+        node = self.nodes[ppid]
+        if pid not in node:
+            child = node[pid] = OrderedDict()
+            # a reused pid keeps pointing at it's first process
+            if pid not in self.nodes:
+                self.nodes[pid] = child
+                self.parents[pid] = ppid
+        return node[pid]
+
+    def node(self, pid):
+        return self.nodes[pid]
+
+    def parent(self, pid):
+        return self.parents.get(pid)
+
+    def children(self, pid):
+        return list(self.nodes[pid].keys())
+
+    def _iter_nodes(self):
+        stack = [(pid, None, node) for (pid, node) in reversed(list(self.roots.items()))]
+        while stack:
+            (pid, ppid, node) = stack.pop()
+            yield (pid, ppid, node)
+            for (cpid, cnode) in reversed(list(node.items())):
+                stack.append((cpid, pid, cnode))
+
+    def walk(self, parents=False):
+        '''Every pid in preorder, optionally as (pid, ppid) pairs'''
+        for (pid, ppid, node) in self._iter_nodes():
+            yield (pid, ppid) if parents else pid
+
+    def to_dict(self):
+        return self.roots
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.roots, **kwargs)
+
+    def dump_pickle(self, f):
+        pickle.dump(self.roots, f)
+
+    def labeled(self, labels):
+        '''A copy of the tree with labels(pid) listed ahead of each node's children'''
+        tree = OrderedDict()
+        stack = [(tree, self.roots)]
+        while stack:
+            (copy, node) = stack.pop()
+            for (pid, children) in node.items():
+                ccopy = copy[pid] = OrderedDict()
+                for label in labels(pid):
+                    ccopy[label] = {}
+                stack.append((ccopy, children))
+        return tree
+
+    def to_asciitree(self, labels=None):
+        import asciitree
+        tree = self.roots if labels is None else self.labeled(labels)
+        return asciitree.LeftAligned()(tree)
@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+
+# pyprofile:
+#   Profile ansible-playbook and it's worker forks from the inside.
+#
+# julian puts a sitecustomize on PYTHONPATH that calls install() in every
+# python it starts, and only ansible-playbook turns profiling on. Forks
+# inherit it and get their own file. In "sample" mode a SIGPROF timer
+# interrupts the process every interval seconds of cpu time and the
+# stack it was in is appended to <dir>/<pid>.stacks. Each distinct stack
+# is written out once and later samples only refer to it's number. In
+# "cprofile" mode cProfile runs the whole time and <dir>/<pid>.pstats is
+# written when the process ends.
+#
+# fork doesn't carry over interval timers, so the child re-arms it, and
+# the child's cProfile starts over. Workers leave through os._exit, which
+# skips atexit, so stack files are written a line at a time and the stats
+# of multiprocessing's workers are dumped from it's own exit hook. A bare
+# fork that ends in os._exit leaves no stats. Only the main thread's
+# stack is sampled.
+#
+# The reading half is for delphiki, which names each sample's task and
+# folds the stacks for flamegraph.pl or speedscope. The profiling half
+# also has to import under the python 2 some ansible releases run on.
+
+import atexit
+import os
+import signal
+import sys
+import time
+
+from collections import Counter
+
+
+ENV_MODE = 'JULIAN_PYPROFILE'
+ENV_DIR = 'JULIAN_PYPROFILE_DIR'
+ENV_INTERVAL = 'JULIAN_PYPROFILE_INTERVAL'
+
+MODES = ('sample', 'cprofile')
+
+# seconds of cpu time between stack samples
+DEFAULT_INTERVAL = 0.01
+
+_PROFILER = None
+
+
+def frame_label(code):
+    '''ansible/executor/task_executor.py:_execute for a code object'''
+    filename = code.co_filename
+    idx = filename.rfind('/ansible/')
+    if idx >= 0:
+        filename = filename[idx + 1:]
+    else:
+        filename = os.path.basename(filename)
+    return '%s:%s' % (filename, code.co_name)
+
+
+class StackSampler(object):
+
+    '''Append the main thread's stack to a file every interval cpu seconds'''
+
+    def __init__(self, dest, interval=DEFAULT_INTERVAL):
+        self.dest = dest
+        self.interval = interval
+        self.f = None
+        self.pid = None
+        self.stacks = {}
+        self.labels = {}
+
+    def start(self):
+        self.pid = os.getpid()
+        self.f = None
+        self.stacks = {}
+        signal.signal(signal.SIGPROF, self.handler)
+        # restart whatever syscall the timer lands in
+        signal.siginterrupt(signal.SIGPROF, False)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def handler(self, signum, frame):
+        codes = []
+        while frame is not None:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        key = tuple(codes)
+        if self.f is None:
+            # opened on the first sample, a fork that execs never writes one,
+            # and line buffered since forks can leave without flushing
+            self.f = open(os.path.join(self.dest, '%s.stacks' % self.pid), 'w', 1)
+        idx = self.stacks.get(key)
+        if idx is None:
+            idx = self.stacks[key] = len(self.stacks)
+            labels = self.labels
+            names = []
+            for code in reversed(codes):
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = frame_label(code)
+                names.append(label)
+            self.f.write('s %s %s\n' % (idx, ';'.join(names)))
+        self.f.write('%.4f %s\n' % (time.time(), idx))
+
+    def after_fork(self):
+        if self.f is not None:
+            self.f.close()
+        self.start()
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        if self.f is not None and self.pid == os.getpid():
+            self.f.close()
+            self.f = None
+
+
+class CProfiler(object):
+
+    '''cProfile the whole process, written out to <pid>.pstats at exit'''
+
+    def __init__(self, dest):
+        self.dest = dest
+        self.profile = None
+        self.pid = None
+
+    def start(self):
+        import cProfile
+        self.pid = os.getpid()
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def after_fork(self):
+        self.profile.disable()
+        self.start()
+
+    def stop(self):
+        if self.profile is None or self.pid != os.getpid():
+            return
+        self.profile.disable()
+        self.profile.dump_stats(os.path.join(self.dest, '%s.pstats' % self.pid))
+        self.profile = None
+
+
+def _after_fork_in_child():
+    _PROFILER.after_fork()
+
+
+def _stop_with_worker(profiler):
+    # multiprocessing workers end in os._exit right after running these
+    from multiprocessing import util
+    util.Finalize(None, profiler.stop, exitpriority=0)
+
+
+def install(environ=None):
+    '''Start profiling this process if julian asked for it, None otherwise'''
+    global _PROFILER
+
+    environ = os.environ if environ is None else environ
+    mode = environ.get(ENV_MODE)
+    dest = environ.get(ENV_DIR)
+    if mode not in MODES or not dest or _PROFILER is not None:
+        return None
+    argv = getattr(sys, 'argv', None) or ['']
+    if not os.path.basename(argv[0]).startswith('ansible-playbook'):
+        return None
+
+    if not os.path.isdir(dest):
+        os.makedirs(dest)
+    if mode == 'sample':
+        interval = float(environ.get(ENV_INTERVAL) or DEFAULT_INTERVAL)
+        _PROFILER = StackSampler(dest, interval=interval)
+    else:
+        _PROFILER = CProfiler(dest)
+
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_after_fork_in_child)
+    else:
+        fork = os.fork
+
+        def profiled_fork():
+            pid = fork()
+            if pid == 0:
+                _after_fork_in_child()
+            return pid
+
+        os.fork = profiled_fork
+
+    try:
+        # a worker starts with an empty Finalize registry, so this has to
+        # run after it was cleared
+        from multiprocessing import util
+        util.register_after_fork(_PROFILER, _stop_with_worker)
+    except ImportError:
+        pass
+
+    atexit.register(_PROFILER.stop)
+    _PROFILER.start()
+    return _PROFILER
+
+
+def list_profiles(directory, suffix):
+    '''{pid: filename} for the <pid><suffix> files in a directory'''
+    profiles = {}
+    if not os.path.isdir(directory):
+        return profiles
+    for fn in os.listdir(directory):
+        if fn.endswith(suffix) and fn[:-len(suffix)].isdigit():
+            profiles[int(fn[:-len(suffix)])] = os.path.join(directory, fn)
+    return profiles
+
+
+def read_stacks(filename):
+    '''[(ts, folded stack)] for the samples in a .stacks file'''
+    stacks = {}
+    samples = []
+    with open(filename, 'r') as f:
+        for line in f:
+            (first, sep, rest) = line.rstrip('\n').partition(' ')
+            if first == 's':
+                (idx, sep, stack) = rest.partition(' ')
+                stacks[idx] = stack
+                continue
+            stack = stacks.get(rest)
+            if stack is None:
+                # cut short by the process getting killed
+                continue
+            try:
+                samples.append((float(first), stack))
+            except ValueError:
+                continue
+    return samples
+
+
+def fold(samples):
+    '''Counter of "label;frame;frame" for [(label, folded stack)]'''
+    folded = Counter()
+    for (label, stack) in samples:
+        # ; separates the frames of a folded stack
+        label = label.replace(';', ',')
+        folded['%s;%s' % (label, stack) if stack else label] += 1
+    return folded
+
+
+def write_folded(folded, dest):
+    '''One "stack count" line per stack, what flamegraph.pl reads'''
+    with open(dest, 'w') as f:
+        for (stack, count) in sorted(folded.items()):
+            f.write('%s %s\n' % (stack, count))
@@ -0,0 +1,548 @@
+#!/usr/bin/env python
+
+# rowstore:
+#   A column oriented container for the rows the debug log parsers emit.
+#
+# Rows are dicts with a dozen or so keys, most of which repeat the same
+# handful of host/task/play names over and over. Here timestamps and pids
+# live in typed arrays, the names are interned and stored as integer codes,
+# and the rare keys (ssh options, executor fields) are kept sparsely. The
+# key order of each row is interned as a "shape" so that rows come back
+# out exactly as they went in.
+
+from array import array
+from itertools import compress
+from operator import itemgetter
+
+
+NULL_INT = -2**63
+NAN = float('nan')
+NEG_INF = float('-inf')
+
+# rows are buffered and moved into the columns this many at a time
+CHUNK_ROWS = 4096
+
+_FLOAT_TYPES = set([float, type(None)])
+_INT_TYPES = set([int, type(None)])
+
+
+class Interner(object):
+
+    '''Map hashable values to dense integer codes and back'''
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def intern(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+    def code(self, value):
+        '''The code for a value or None if it was never interned'''
+        return self.codes.get(value)
+
+
+class FloatColumn(object):
+
+    '''Floats in an array('d'), None is NaN, odd types go to an overflow'''
+
+    def __init__(self, data=None, other=None):
+        self.data = data if data is not None else array('d')
+        self.other = other if other is not None else {}
+        self.n = len(self.data)
+
+    def append(self, value):
+        if type(value) is float:
+            self.data.append(value)
+        else:
+            self.data.append(NAN)
+            if value is not None:
+                self.other[self.n] = value
+        self.n += 1
+
+    def fill(self, count):
+        self.data.extend(array('d', [NAN]) * count)
+        self.n += count
+
+    def extend_values(self, values):
+        if set(map(type, values)) <= _FLOAT_TYPES:
+            self.data.extend(array('d', [NAN if x is None else x for x in values]))
+            self.n += len(values)
+        else:
+            for value in values:
+                self.append(value)
+
+    def get(self, idx):
+        if self.other and idx in self.other:
+            return self.other[idx]
+        value = self.data[idx]
+        if value != value:
+            return None
+        return value
+
+    def set(self, idx, value):
+        self.other.pop(idx, None)
+        if type(value) is float:
+            self.data[idx] = value
+        else:
+            self.data[idx] = NAN
+            if value is not None:
+                self.other[idx] = value
+
+    def take(self, indices):
+        data = self.data
+        return FloatColumn(array('d', [data[x] for x in indices]), _take_sparse(self.other, indices))
+
+    def extend(self, other):
+        for idx,value in other.other.items():
+            self.other[idx + self.n] = value
+        self.data.extend(other.data)
+        self.n += other.n
+
+
+class IntColumn(object):
+
+    '''Ints in an array('q'), None is NULL_INT, odd types go to an overflow'''
+
+    def __init__(self, data=None, other=None):
+        self.data = data if data is not None else array('q')
+        self.other = other if other is not None else {}
+        self.n = len(self.data)
+
+    def append(self, value):
+        if type(value) is int and NULL_INT < value < 2**63:
+            self.data.append(value)
+        else:
+            self.data.append(NULL_INT)
+            if value is not None:
+                self.other[self.n] = value
+        self.n += 1
+
+    def fill(self, count):
+        self.data.extend(array('q', [NULL_INT]) * count)
+        self.n += count
+
+    def extend_values(self, values):
+        try:
+            if set(map(type, values)) > _INT_TYPES:
+                raise TypeError
+            data = array('q', [NULL_INT if x is None else x for x in values])
+            if NULL_INT in data:
+                raise OverflowError
+        except (TypeError, OverflowError):
+            for value in values:
+                self.append(value)
+            return
+        self.data.extend(data)
+        self.n += len(values)
+
+    def get(self, idx):
+        if self.other and idx in self.other:
+            return self.other[idx]
+        value = self.data[idx]
+        if value == NULL_INT:
+            return None
+        return value
+
+    def set(self, idx, value):
+        self.other.pop(idx, None)
+        if type(value) is int and NULL_INT < value < 2**63:
+            self.data[idx] = value
+        else:
+            self.data[idx] = NULL_INT
+            if value is not None:
+                self.other[idx] = value
+
+    def take(self, indices):
+        data = self.data
+        return IntColumn(array('q', [data[x] for x in indices]), _take_sparse(self.other, indices))
+
+    def extend(self, other):
+        for idx,value in other.other.items():
+            self.other[idx + self.n] = value
+        self.data.extend(other.data)
+        self.n += other.n
+
+
+class CodedColumn(object):
+
+    '''Repetitive hashable values stored as codes into an Interner'''
+
+    def __init__(self, interner=None, codes=None):
+        self.interner = interner if interner is not None else Interner()
+        self.codes = codes if codes is not None else array('i')
+        self.n = len(self.codes)
+
+    def append(self, value):
+        self.codes.append(self.interner.intern(value))
+        self.n += 1
+
+    def fill(self, count):
+        self.codes.extend(array('i', [self.interner.intern(None)]) * count)
+        self.n += count
+
+    def extend_values(self, values):
+        interner = self.interner
+        for value in set(values):
+            interner.intern(value)
+        codes = interner.codes
+        self.codes.extend(array('i', [codes[x] for x in values]))
+        self.n += len(values)
+
+    def get(self, idx):
+        return self.interner.values[self.codes[idx]]
+
+    def set(self, idx, value):
+        self.codes[idx] = self.interner.intern(value)
+
+    def take(self, indices):
+        codes = self.codes
+        return CodedColumn(self.interner, array('i', [codes[x] for x in indices]))
+
+    def extend(self, other):
+        table = [self.interner.intern(x) for x in other.interner.values]
+        self.codes.extend(array('i', [table[x] for x in other.codes]))
+        self.n += other.n
+
+    def where(self, value):
+        '''Indices of every row holding value'''
+        code = self.interner.code(value)
+        if code is None:
+            return []
+        return list(compress(range(self.n), [x == code for x in self.codes]))
+
+
+class ObjectColumn(object):
+
+    '''Mostly unique values such as the raw log lines, kept in a list'''
+
+    def __init__(self, data=None):
+        self.data = data if data is not None else []
+        self.n = len(self.data)
+
+    def append(self, value):
+        self.data.append(value)
+        self.n += 1
+
+    def fill(self, count):
+        self.data.extend([None] * count)
+        self.n += count
+
+    def extend_values(self, values):
+        self.data.extend(values)
+        self.n += len(values)
+
+    def get(self, idx):
+        return self.data[idx]
+
+    def set(self, idx, value):
+        self.data[idx] = value
+
+    def take(self, indices):
+        data = self.data
+        return ObjectColumn([data[x] for x in indices])
+
+    def extend(self, other):
+        self.data.extend(other.data)
+        self.n += other.n
+
+
+class SparseColumn(object):
+
+    '''Keys that only a few rows carry, stored as idx -> value'''
+
+    def __init__(self, data=None, n=0):
+        self.data = data if data is not None else {}
+        self.n = n
+
+    def append(self, value):
+        if value is not None:
+            self.data[self.n] = value
+        self.n += 1
+
+    def fill(self, count):
+        self.n += count
+
+    def extend_values(self, values):
+        for (idx, value) in enumerate(values, self.n):
+            if value is not None:
+                self.data[idx] = value
+        self.n += len(values)
+
+    def get(self, idx):
+        return self.data.get(idx)
+
+    def set(self, idx, value):
+        if value is None:
+            self.data.pop(idx, None)
+        else:
+            self.data[idx] = value
+
+    def take(self, indices):
+        return SparseColumn(_take_sparse(self.data, indices), len(indices))
+
+    def extend(self, other):
+        for idx,value in other.data.items():
+            self.data[idx + self.n] = value
+        self.n += other.n
+
+
+def _take_sparse(data, indices):
+    if not data:
+        return {}
+    return dict((idn, data[idx]) for (idn, idx) in enumerate(indices) if idx in data)
+
+
+class RowStore(object):
+
+    '''A list of dict rows stored column by column
+
+    Appended rows are buffered and moved into the columns a chunk at a
+    time, or whenever the store is read. Rows must not be changed after
+    they are appended.
+    '''
+
+    COLUMN_TYPES = {
+        'ts': FloatColumn,
+        'rts': FloatColumn,
+        'gap': FloatColumn,
+        'pid': IntColumn,
+        'ppid': IntColumn,
+        'linenum': IntColumn,
+        'index': IntColumn,
+        'host': CodedColumn,
+        'task': CodedColumn,
+        'task_uuid': CodedColumn,
+        'play': CodedColumn,
+        'playbook': CodedColumn,
+        'module': CodedColumn,
+        'file': CodedColumn,
+        'date': CodedColumn,
+        'uid': CodedColumn,
+        'uuid': CodedColumn,
+        'hostname': CodedColumn,
+        'port': CodedColumn,
+        'user': CodedColumn,
+        'timeout': CodedColumn,
+        'cp': CodedColumn,
+        'cp_path': CodedColumn,
+        'sshpass': CodedColumn,
+        'hostkey_checking': CodedColumn,
+        'time': ObjectColumn,
+        'line': ObjectColumn,
+    }
+
+    def __init__(self):
+        self.size = 0
+        self.shapes = Interner()
+        self.shape_codes = array('i')
+        self._columns = {}
+        self._pending = []
+
+    @classmethod
+    def from_rows(cls, rows):
+        store = cls()
+        for row in rows:
+            store.append(row)
+        return store
+
+    @property
+    def columns(self):
+        if self._pending:
+            self._flush()
+        return self._columns
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        for idx in range(self.size):
+            yield self.row(idx)
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += self.size
+        if not 0 <= idx < self.size:
+            raise IndexError(idx)
+        return self.row(idx)
+
+    def _column(self, key):
+        columns = self.columns
+        column = columns.get(key)
+        if column is None:
+            column = self.COLUMN_TYPES.get(key, SparseColumn)()
+            column.fill(self.size)
+            columns[key] = column
+        return column
+
+    def append(self, row):
+        self._pending.append(row)
+        self.size += 1
+        if len(self._pending) >= CHUNK_ROWS:
+            self._flush()
+
+    def _flush(self):
+        '''Move the buffered rows into the columns one column at a time'''
+        rows = self._pending
+        self._pending = []
+        count = len(rows)
+        start = self.size - count
+
+        # group the rows by their keys so each group can be split with
+        # one itemgetter instead of a dict lookup per row and column
+        intern = self.shapes.intern
+        groups = {}
+        codes = array('i')
+        for (idx, row) in enumerate(rows):
+            shape = tuple(row)
+            group = groups.get(shape)
+            if group is None:
+                group = groups[shape] = ([], [])
+            group[0].append(idx)
+            group[1].append(row)
+            codes.append(intern(shape))
+        self.shape_codes.extend(codes)
+
+        values = {}
+        for shape,(idxs, grows) in groups.items():
+            if len(shape) == 1:
+                split = [[x[shape[0]] for x in grows]]
+            else:
+                split = zip(*map(itemgetter(*shape), grows))
+            for (key, kvalues) in zip(shape, split):
+                if len(groups) == 1:
+                    values[key] = list(kvalues)
+                    continue
+                if key not in values:
+                    values[key] = [None] * count
+                column = values[key]
+                for (idx, value) in zip(idxs, kvalues):
+                    column[idx] = value
+
+        columns = self._columns
+        for key in values:
+            if key not in columns:
+                column = self.COLUMN_TYPES.get(key, SparseColumn)()
+                column.fill(start)
+                columns[key] = column
+
+        for key,column in columns.items():
+            if key in values:
+                column.extend_values(values[key])
+            else:
+                column.fill(count)
+
+    def extend(self, other):
+        '''Append every row of another store, column by column'''
+        if other._pending:
+            other._flush()
+        for key in other.columns:
+            self._column(key)
+        for key,column in self.columns.items():
+            ocolumn = other.columns.get(key)
+            if ocolumn is None:
+                column.fill(other.size)
+            else:
+                column.extend(ocolumn)
+        table = [self.shapes.intern(x) for x in other.shapes.values]
+        self.shape_codes.extend(array('i', [table[x] for x in other.shape_codes]))
+        self.size += other.size
+
+    def all_keys(self):
+        '''The union of the keys of every row'''
+        if self._pending:
+            self._flush()
+        keys = set()
+        for code in set(self.shape_codes):
+            keys.update(self.shapes.values[code])
+        return keys
+
+    def keys(self, idx):
+        if self._pending:
+            self._flush()
+        return self.shapes.values[self.shape_codes[idx]]
+
+    def row(self, idx):
+        columns = self.columns
+        return dict((key, columns[key].get(idx)) for key in self.keys(idx))
+
+    def get(self, idx, key, default=None):
+        if key not in self.keys(idx):
+            return default
+        return self.columns[key].get(idx)
+
+    def set(self, idx, key, value):
+        shape = self.keys(idx)
+        if key not in shape:
+            self.shape_codes[idx] = self.shapes.intern(shape + (key,))
+        self._column(key).set(idx, value)
+
+    def pop(self, idx, key):
+        shape = self.keys(idx)
+        if key not in shape:
+            return None
+        value = self.columns[key].get(idx)
+        self.columns[key].set(idx, None)
+        self.shape_codes[idx] = self.shapes.intern(tuple(x for x in shape if x != key))
+        return value
+
+    def take(self, indices):
+        '''A new store holding just the given rows, in the given order'''
+        indices = list(indices)
+        columns = self.columns
+        store = RowStore()
+        store.size = len(indices)
+        store.shapes = self.shapes
+        codes = self.shape_codes
+        store.shape_codes = array('i', [codes[x] for x in indices])
+        store._columns = dict((k, v.take(indices)) for (k, v) in columns.items())
+        return store
+
+    def where(self, key, value):
+        '''Indices of every row where row.get(key) == value'''
+        column = self.columns.get(key)
+        if column is None:
+            return []
+        if isinstance(column, CodedColumn):
+            return column.where(value)
+        return [idx for idx in range(self.size) if self.get(idx, key) == value]
+
+    def with_key(self, key):
+        '''Indices of every row that has key'''
+        if self._pending:
+            self._flush()
+        shapes = set(idx for (idx, shape) in enumerate(self.shapes.values) if key in shape)
+        return [idx for (idx, code) in enumerate(self.shape_codes) if code in shapes]
+
+    def add_keys(self, keys):
+        '''Append keys to the shape of every row that lacks them'''
+        if self._pending:
+            self._flush()
+        table = []
+        for shape in self.shapes.values:
+            newshape = shape + tuple(x for x in keys if x not in shape)
+            table.append(self.shapes.intern(newshape))
+        self.shape_codes = array('i', [table[x] for x in self.shape_codes])
+
+    def set_float_column(self, key, values):
+        self.columns[key] = FloatColumn(array('d', values))
+
+    def set_int_column(self, key, values):
+        self.columns[key] = IntColumn(array('q', values))
+
+    def timestamps(self):
+        '''The ts column as an array with missing values as NaN'''
+        column = self.columns.get('ts')
+        if column is None:
+            return array('d', [NAN]) * self.size
+        return column.data
+
+    def order_by_ts(self):
+        '''Indices in timestamp order, rows without one sort first'''
+        ts = self.timestamps()
+        return sorted(range(self.size), key=lambda x: ts[x] if ts[x] == ts[x] else NEG_INF)
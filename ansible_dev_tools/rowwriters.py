@@ -0,0 +1,362 @@
+#!/usr/bin/env python
+
+# rowwriters:
+#   Streaming writers for the rows the debug log parsers emit.
+#
+# The format comes from the destination's extension: .csv, .json (one
+# array), .ndjson/.jsonl (one object per line) or .adtc (columnar), with an
+# optional .gz or .zst on the end to compress it. Rows are written in
+# batches of a bounded size as they arrive, so the whole result never has
+# to be rendered in memory, and the output can be split into one file per
+# host or task. Only so many partitions are kept open at once, the least
+# recently used one is closed to make room and later appended to, or for
+# formats that can't be appended to, continued in another part file.
+
+import csv
+import gzip
+import io
+import json
+import os
+import re
+
+from collections import OrderedDict
+
+from ansible_dev_tools import columnar
+
+HAS_ZSTD = False
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    pass
+
+
+BATCH_ROWS = 10000
+
+# partitions with an open file, compressor and batch at any one time
+MAX_OPEN_PARTITIONS = 64
+
+FORMATS = ('csv', 'json', 'ndjson', 'jsonl', 'adtc')
+# gzip and zstd both read concatenated members back as one stream
+APPENDABLE = ('csv', 'ndjson', 'jsonl')
+COMPRESSIONS = ('gz', 'zst')
+
+# the csv columns that lead, everything else is sorted with line last
+CSV_LEADING_KEYS = ['ts', 'pid', 'play', 'task', 'host']
+
+
+def split_dest(dest):
+    '''out.csv.gz -> ('out', 'csv', 'gz'), format None if unknown'''
+    (base, ext) = os.path.splitext(dest)
+    compression = None
+    if ext.lstrip('.') in COMPRESSIONS:
+        compression = ext.lstrip('.')
+        (base, ext) = os.path.splitext(base)
+    fmt = ext.lstrip('.')
+    if fmt not in FORMATS:
+        return (dest, None, None)
+    return (base, fmt, compression)
+
+
+def check_dest(dest):
+    '''Raise ValueError if rows can't be written to dest'''
+    (base, fmt, compression) = split_dest(dest)
+    if fmt is None:
+        raise ValueError('%s does not end with one of .%s' % (dest, ', .'.join(FORMATS)))
+    if compression == 'zst' and not HAS_ZSTD:
+        raise ValueError('writing %s requires the zstandard library' % dest)
+
+
+def partition_path(dest, value):
+    '''out.csv.gz + host1 -> out.host1.csv.gz'''
+    (base, fmt, compression) = split_dest(dest)
+    value = re.sub(r'[^\w.-]+', '_', str(value)).strip('.') or '_'
+    path = '%s.%s.%s' % (base, value, fmt)
+    if compression:
+        path += '.' + compression
+    return path
+
+
+def part_path(path, part):
+    '''out.host1.json + 1 -> out.host1.part1.json'''
+    (base, fmt, compression) = split_dest(path)
+    path = '%s.part%s.%s' % (base, part, fmt)
+    if compression:
+        path += '.' + compression
+    return path
+
+
+def csv_keys(keys):
+    '''Order a set of row keys the way the csv columns are laid out'''
+    keys = sorted(x for x in keys if x != 'line' and x not in CSV_LEADING_KEYS)
+    keys = [x for x in CSV_LEADING_KEYS] + keys + ['line']
+    return keys
+
+
+def format_ts(ts):
+    '''Pad a float timestamp out to at least 5 decimal places'''
+    if ts is None:
+        return ''
+    ts = str(ts)
+    dot = ts.find('.')
+    if dot == -1:
+        return ts + '.00000'
+    short = 6 - (len(ts) - dot)
+    if short > 0:
+        ts += '0' * short
+    return ts
+
+
+def _open(path, compression, append=False):
+    '''A binary file, compressed to match the extension'''
+    mode = 'ab' if append else 'wb'
+    if compression == 'gz':
+        return gzip.open(path, mode, compresslevel=6)
+    if compression == 'zst':
+        return zstandard.ZstdCompressor().stream_writer(open(path, mode))
+    return open(path, mode)
+
+
+class RowsWriter(object):
+
+    '''Buffer rows and hand them to write_batch() batch_rows at a time
+
+    append continues a file an earlier writer of the same format closed.
+    '''
+
+    def __init__(self, path, compression=None, keys=None, batch_rows=BATCH_ROWS, append=False):
+        self.path = path
+        self.keys = keys
+        self.batch_rows = batch_rows
+        self.append = append
+        self.batch = []
+        self.count = 0
+        self.f = _open(path, compression, append=append)
+        self.open()
+
+    def open(self):
+        pass
+
+    def write(self, row):
+        self.batch.append(row)
+        if len(self.batch) >= self.batch_rows:
+            self.flush()
+
+    def writerows(self, rows):
+        for row in rows:
+            self.write(row)
+
+    def flush(self):
+        if self.batch:
+            self.write_batch(self.batch)
+            self.count += len(self.batch)
+            self.batch = []
+
+    def write_batch(self, rows):
+        raise NotImplementedError
+
+    def finish(self):
+        pass
+
+    def close(self):
+        self.flush()
+        self.finish()
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class TextRowsWriter(RowsWriter):
+
+    def open(self):
+        self.text = io.TextIOWrapper(self.f, encoding='utf-8', newline='')
+
+    def close(self):
+        self.flush()
+        self.finish()
+        self.text.close()
+
+
+class CSVRowsWriter(TextRowsWriter):
+
+    '''Without keys the columns are whatever the first batch holds'''
+
+    def open(self):
+        TextRowsWriter.open(self)
+        self.cw = None
+
+    def write_batch(self, rows):
+        if self.cw is None:
+            keys = self.keys
+            if keys is None:
+                keys = set()
+                for row in rows:
+                    keys.update(row)
+            self.keys = csv_keys(keys)
+            self.cw = csv.writer(self.text)
+            # an appended file already starts with the header
+            if not self.append:
+                self.cw.writerow(self.keys)
+
+        keys = self.keys
+        self.cw.writerows(
+            [
+                format_ts(row.get(k)) if k == 'ts' else
+                row.get(k, '').strip() if k == 'line' else
+                row.get(k, '')
+                for k in keys
+            ]
+            for row in rows
+        )
+
+    def finish(self):
+        if self.count == 0 and not self.append:
+            self.keys = csv_keys(self.keys or [])
+            csv.writer(self.text).writerow(self.keys)
+
+
+class JSONRowsWriter(TextRowsWriter):
+
+    '''A single json array, as json.dumps(list(rows)) would render it'''
+
+    def open(self):
+        TextRowsWriter.open(self)
+        self.text.write('[')
+
+    def write_batch(self, rows):
+        if self.count:
+            self.text.write(', ')
+        # a batch renders as one array with the brackets cut off
+        self.text.write(json.dumps(rows)[1:-1])
+
+    def finish(self):
+        self.text.write(']')
+
+
+class NDJSONRowsWriter(TextRowsWriter):
+
+    def write_batch(self, rows):
+        self.text.write(''.join([json.dumps(x) + '\n' for x in rows]))
+
+
+class ColumnarRowsWriter(RowsWriter):
+
+    '''Each batch becomes a rows.N table of a columnar file'''
+
+    def open(self):
+        self.tables = columnar.TableWriter(self.f)
+
+    def write_batch(self, rows):
+        self.tables.write_table('rows.%s' % (self.count // self.batch_rows), rows)
+
+    def finish(self):
+        self.tables.close()
+
+
+WRITERS = {
+    'csv': CSVRowsWriter,
+    'json': JSONRowsWriter,
+    'ndjson': NDJSONRowsWriter,
+    'jsonl': NDJSONRowsWriter,
+    'adtc': ColumnarRowsWriter,
+}
+
+
+class PartitionedRowsWriter(object):
+
+    '''One writer per distinct value of a row key, at most max_open at once'''
+
+    def __init__(self, dest, partition_by, keys=None, batch_rows=BATCH_ROWS, max_open=MAX_OPEN_PARTITIONS):
+        self.dest = dest
+        self.partition_by = partition_by
+        self.keys = keys
+        self.batch_rows = batch_rows
+        self.max_open = max(1, max_open)
+        (base, self.fmt, self.compression) = split_dest(dest)
+        self.paths = {}
+        # path -> writer, least recently used first
+        self.writers = OrderedDict()
+        # path -> (keys, parts) of the partitions that had to be closed
+        self.closed = {}
+
+    def _writer(self, path):
+        writer = self.writers.get(path)
+        if writer is not None:
+            self.writers.move_to_end(path)
+            return writer
+
+        if len(self.writers) >= self.max_open:
+            (lru, evicted) = self.writers.popitem(last=False)
+            evicted.close()
+            parts = self.closed.get(lru, (None, 1))[1]
+            self.closed[lru] = (evicted.keys, parts)
+
+        keys = self.keys
+        fpath = path
+        append = False
+        if path in self.closed:
+            (keys, parts) = self.closed[path]
+            if self.fmt in APPENDABLE:
+                append = True
+            else:
+                # a closed json array or columnar file can't take more rows
+                fpath = part_path(path, parts)
+                self.closed[path] = (keys, parts + 1)
+                keys = self.keys
+        writer = self.writers[path] = WRITERS[self.fmt](
+            fpath,
+            compression=self.compression,
+            keys=keys,
+            batch_rows=self.batch_rows,
+            append=append
+        )
+        return writer
+
+    def write(self, row):
+        value = row.get(self.partition_by)
+        path = self.paths.get(value)
+        if path is None:
+            # values that clean up to the same file name share a writer
+            path = self.paths[value] = partition_path(self.dest, value)
+        self._writer(path).write(row)
+
+    def writerows(self, rows):
+        for row in rows:
+            self.write(row)
+
+    def close(self):
+        while self.writers:
+            self.writers.popitem(last=False)[1].close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def open_rows_writer(dest, keys=None, partition_by=None, batch_rows=BATCH_ROWS, max_open=MAX_OPEN_PARTITIONS):
+    '''A writer for dest, split into a file per partition_by value if set'''
+    check_dest(dest)
+    if partition_by:
+        return PartitionedRowsWriter(dest, partition_by, keys=keys, batch_rows=batch_rows, max_open=max_open)
+    (base, fmt, compression) = split_dest(dest)
+    return WRITERS[fmt](dest, compression=compression, keys=keys, batch_rows=batch_rows)
+
+
+def write_rows(dest, rows, keys=None, partition_by=None, batch_rows=BATCH_ROWS, max_open=MAX_OPEN_PARTITIONS):
+    with open_rows_writer(dest, keys=keys, partition_by=partition_by, batch_rows=batch_rows, max_open=max_open) as writer:
+        writer.writerows(rows)
+
+
+def read_columnar_rows(path):
+    '''Yield the rows of a .adtc file a batch at a time'''
+    with open(path, 'rb') as f:
+        data = f.read()
+    for (name, rows) in columnar.iter_tables(data):
+        for row in rows:
+            yield row
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+
+# sosreport:
+#   Load the system logs out of extracted sosreports.
+#
+# A sosreport's syslog, secure, yum, journal and audit logs hold hundreds
+# of thousands of lines which only have a few distinct timestamps per
+# second. Each distinct timestamp is only parsed and localized once,
+# (possibly gzip'd) files are read as a stream and the sources, which are
+# each sorted already, are merged instead of being sorted all over again.
+# Each entry is [localized datetime, 'basename:linenumber', line].
+
+import datetime
+import glob
+import gzip
+import heapq
+import multiprocessing
+import os
+import re
+
+from operator import itemgetter
+
+import pytz
+
+
+AUDIT_TS_RE = re.compile(r'msg=\S*?\(([^:)]+)')
+
+
+class TimestampCache(object):
+    '''Memoize timestamp string -> localized datetime for one timezone'''
+
+    def __init__(self, timezone):
+        self.tz = pytz.timezone(timezone)
+        self.cache = {}
+
+    def strptime(self, ds, fmt):
+        '''Parse and localize a timestamp, None if it doesn't parse'''
+        try:
+            return self.cache[ds]
+        except KeyError:
+            pass
+        try:
+            dstz = self.tz.localize(datetime.datetime.strptime(ds, fmt))
+        except ValueError:
+            dstz = None
+        self.cache[ds] = dstz
+        return dstz
+
+    def fromtimestamp(self, ts):
+        '''Localize an epoch timestamp string'''
+        ds = datetime.datetime.fromtimestamp(float(ts))
+        # the offset can only change on a whole second
+        second = ds.replace(microsecond=0)
+        try:
+            dstz = self.cache[second]
+        except KeyError:
+            dstz = self.cache[second] = self.tz.localize(second)
+        if ds.microsecond:
+            dstz = dstz.replace(microsecond=ds.microsecond)
+        return dstz
+
+
+def open_log(filename):
+    '''Open a plain or gzip'd log for line by line reading as text'''
+    if filename.endswith('.gz'):
+        return gzip.open(filename, 'rt')
+    return open(filename, 'r')
+
+
+def syslog_year(filename):
+    '''Rotated logs carry their year in the name, messages-20181125'''
+    year = '2018'
+    if '-' in filename:
+        bn = os.path.basename(filename)
+        bn = bn.split('-', 1)[-1]
+        bn = bn[:4]
+        try:
+            year = str(int(bn))
+        except ValueError:
+            pass
+    return year
+
+
+def read_syslogs(syslogs, timezone=None, tscache=None):
+    # Nov 27 10:33:12 <hostname> ...
+    if tscache is None:
+        tscache = TimestampCache(timezone)
+
+    syslog = []
+    for syslogfn in syslogs:
+        year = syslog_year(syslogfn) + ' '
+        bn = os.path.basename(syslogfn) + ':'
+        with open_log(syslogfn) as f:
+            for idx,x in enumerate(f):
+                ds = year + ' '.join(x.split(None, 3)[0:3])
+                dstz = tscache.strptime(ds, '%Y %b %d %H:%M:%S')
+                if dstz is None:
+                    continue
+                syslog.append([dstz, bn + str(idx), x.rstrip()])
+    return syslog
+
+
+def read_up2date_log(logfile, timezone=None, tscache=None):
+    # [Mon Oct 29 08:34:56 2018] up2date
+    if tscache is None:
+        tscache = TimestampCache(timezone)
+
+    logs = []
+    if not os.path.exists(logfile):
+        return logs
+    bn = os.path.basename(logfile) + ':'
+    with open_log(logfile) as f:
+        for idl,line in enumerate(f):
+            ds = line.split(']', 1)[0].lstrip('[')
+            dstz = tscache.strptime(ds, '%a %b %d %H:%M:%S %Y')
+            if dstz is None:
+                raise ValueError('unparseable up2date timestamp: %s' % ds)
+            logs.append([dstz, bn + str(idl), line.rstrip()])
+    return logs
+
+
+def read_audit_logs(logfiles, timezone=None, tscache=None):
+    # type=CRYPTO_KEY_USER msg=audit(1543378336.090:3600): pid=30297 uid=0
+    if tscache is None:
+        tscache = TimestampCache(timezone)
+
+    logs = []
+    for lf in logfiles:
+        bn = os.path.basename(lf) + ':'
+        with open_log(lf) as f:
+            for idl,line in enumerate(f):
+                ts = AUDIT_TS_RE.search(line).group(1)
+                logs.append([tscache.fromtimestamp(ts), bn + str(idl), line.rstrip()])
+    return logs
+
+
+def get_sos_logs(sosdir):
+    '''Read every known log from an extracted sosreport, in time order'''
+
+    hnfile = os.path.join(sosdir, 'hostname')
+    with open(hnfile, 'r') as f:
+        hostname = f.read().strip()
+
+    datefile = os.path.join(sosdir, 'sos_commands', 'general', 'date')
+    with open(datefile, 'r') as f:
+        ds = f.read()
+    tscache = TimestampCache(ds.split()[4])
+
+    sources = [
+        read_audit_logs(sorted(glob.glob('%s/var/log/audit/*' % sosdir)), tscache=tscache),
+    ]
+    for pattern in ['sos_commands/logs/*', 'var/log/messages*', 'var/log/secure*', 'var/log/yum*']:
+        logfiles = sorted(glob.glob(os.path.join(sosdir, pattern)))
+        sources.append(read_syslogs(logfiles, tscache=tscache))
+    sources.append(read_up2date_log('%s/var/log/up2date' % sosdir, tscache=tscache))
+
+    # rotated files make a source's runs out of order, timsort merges
+    # those runs and the sources are then merged without another sort
+    key = itemgetter(0)
+    for source in sources:
+        source.sort(key=key)
+    logs = list(heapq.merge(*sources, key=key))
+    return (hostname, logs)
+
+
+def load_sos_reports(sosdirs, jobs=1):
+    '''Load several sosreports, one per process, into hostname -> logs'''
+    if jobs > 1 and len(sosdirs) > 1:
+        pool = multiprocessing.Pool(processes=min(jobs, len(sosdirs)))
+        try:
+            results = pool.map(get_sos_logs, sosdirs, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [get_sos_logs(x) for x in sosdirs]
+
+    soshosts = {}
+    for (hn, soslogs) in results:
+        soshosts[hn] = soslogs
+    return soshosts
@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+
+# stracelog:
+#   Read the per pid files of strace -ff -tt -T
+#
+# Only a pid's first and last lines, it's execve calls and it's clones are
+# worth keeping, which is a handful of lines out of millions. Files are read
+# in large blocks and searched for those syscalls with a single regex, so
+# every other line is only ever seen by that search, and only an execve's
+# argv is ever evaluated. Each file is independent of the others, so
+# directories with thousands of them can be spread over a process pool.
+#
+# Runs captured without strace have procsampler's per process records
+# instead, which are turned into the same rows: an execve when the process
+# was first seen, a clone in it's parent and it's last sighting.
+
+import ast
+import multiprocessing
+import re
+
+
+BLOCK_SIZE = 1024 * 1024
+
+# clone3 is what newer glibcs use for posix_spawn, python's subprocess among them
+FORK_SYSCALLS = ('clone', 'clone3', 'fork', 'vfork')
+
+KEEP_RE = re.compile(r' (?:execve|clone3?|v?fork)\(')
+TS_RE = re.compile(r'\d+\.\d+')
+SYSCALL_RE = re.compile(r' (\w+)\(')
+ARGV_RE = re.compile(r'\[.*\],')
+
+
+def _parse_argv(line):
+    # execve("/usr/bin/ssh", ["ssh", "-vvv", ..., "el7host", "/bin/sh -c ..."], ...
+    try:
+        return ast.literal_eval(ARGV_RE.search(line).group().rstrip(','))
+    except Exception:
+        return []
+
+
+def _parse_retval(line):
+    # clone(child_stack=NULL, flags=...) = 6000 <0.000200>
+    (head, eq, tail) = line.rpartition(' = ')
+    if eq:
+        retval = tail.split(None, 1)
+        if retval and retval[0].isdigit():
+            return int(retval[0])
+    return None
+
+
+def ssh_host(cmd):
+    '''The host an ssh argv connects to'''
+    host = None
+    if len(cmd) > 3:
+        if '-L' in cmd:
+            host = cmd[cmd.index('-L') + 1]
+        else:
+            host = cmd[-2]
+        if '@' in host:
+            host = host.split('@')[1]
+    return host
+
+
+def pid_from_filename(filename):
+    '''strace.5120 -> 5120'''
+    return int(filename.split('.')[-1])
+
+
+def parse_strace_line(filename, linenumber, line, pidnum=None):
+    '''A row for one strace line, None if it has no timestamp'''
+
+    if pidnum is None:
+        pidnum = pid_from_filename(filename)
+
+    match = TS_RE.search(line)
+    if match is None:
+        return None
+    ts = match.group()
+
+    syscall = None
+    match = SYSCALL_RE.search(line)
+    if match:
+        syscall = match.group(1)
+    elif 'SIGCHLD' in line:
+        # when the master kills children, SIGCHLD is used ...
+        # 1549310198.245188 --- SIGCHLD {si_signo=SIGCHLD ...
+        syscall = 'SIGCHLD'
+
+    duration = line.rstrip().rsplit(None, 1)[-1].replace('<', '').replace('>', '')
+    try:
+        float(duration)
+    except ValueError:
+        duration = None
+
+    # argv is all that's ever used out of the arguments
+    cmd = []
+    host = None
+    if syscall == 'execve':
+        cmd = _parse_argv(line)
+        if 'ssh' in str(cmd):
+            host = ssh_host(cmd)
+
+    clones = []
+    if syscall in FORK_SYSCALLS:
+        clones.append(_parse_retval(line))
+
+    return {
+        'clones': clones,
+        'ppid': None,
+        'pid': pidnum,
+        'ts': float(ts),
+        'duration': duration,
+        'strace': True,
+        'syscall': syscall,
+        'args': cmd,
+        'host': host,
+        'filename': filename,
+        'linenumber': linenumber,
+    }
+
+
+def iter_line_blocks(f, blocksize=BLOCK_SIZE):
+    '''(first line number, block of whole lines) for an open file'''
+    lineno = 0
+    rest = ''
+    while True:
+        block = f.read(blocksize)
+        if not block:
+            break
+        block = rest + block
+        end = block.rfind('\n') + 1
+        if not end:
+            rest = block
+            continue
+        rest = block[end:]
+        yield (lineno, block[:end])
+        lineno += block.count('\n', 0, end)
+    if rest:
+        yield (lineno, rest)
+
+
+def read_strace_file(filename, blocksize=BLOCK_SIZE):
+    '''The rows worth keeping from one strace output file'''
+
+    pidnum = pid_from_filename(filename)
+    rows = []
+    first = None
+    last = None
+
+    with open(filename, 'r') as f:
+        for (lineno, block) in iter_line_blocks(f, blocksize=blocksize):
+            if first is None:
+                first = block[:block.find('\n') + 1 or len(block)]
+            last = (lineno, block)
+
+            counted = 0
+            for match in KEEP_RE.finditer(block):
+                start = block.rfind('\n', 0, match.start()) + 1
+                lineno += block.count('\n', counted, start)
+                counted = start
+                if lineno == 0 or (rows and rows[-1]['linenumber'] == lineno):
+                    continue
+                end = block.find('\n', match.end()) + 1 or len(block)
+                row = parse_strace_line(filename, lineno, block[start:end], pidnum=pidnum)
+                if row is not None and (row['syscall'] == 'execve' or row['clones']):
+                    rows.append(row)
+
+    if first is not None and first.strip():
+        row = parse_strace_line(filename, 0, first, pidnum=pidnum)
+        if row is not None:
+            rows.insert(0, row)
+
+    # the last line of the file is always in the last block
+    if last is not None:
+        (lineno, block) = last
+        block = block.rstrip('\n')
+        cut = block.rfind('\n') + 1
+        lineno += block.count('\n')
+        line = block[cut:]
+        if lineno and line.strip() and not (rows and rows[-1]['linenumber'] == lineno):
+            row = parse_strace_line(filename, lineno, line, pidnum=pidnum)
+            if row is not None:
+                rows.append(row)
+
+    return rows
+
+
+def _read_strace_file(filename):
+    return (filename, read_strace_file(filename))
+
+
+def load_strace_files(filenames, jobs=1):
+    '''Yield (filename, rows) in order, reading the files in jobs processes'''
+    if jobs <= 1 or len(filenames) <= 1:
+        for filename in filenames:
+            yield _read_strace_file(filename)
+        return
+
+    # strace -ff leaves lots of small files, hand them out in chunks
+    chunksize = max(1, min(64, len(filenames) // (jobs * 4)))
+    pool = multiprocessing.Pool(processes=min(jobs, len(filenames)))
+    try:
+        for result in pool.imap(_read_strace_file, filenames, chunksize=chunksize):
+            yield result
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _row(pid, ts, filename, linenumber, syscall=None, args=None, clones=None, host=None):
+    return {
+        'clones': clones or [],
+        'ppid': None,
+        'pid': pid,
+        'ts': ts,
+        'duration': None,
+        'strace': True,
+        'syscall': syscall,
+        'args': args or [],
+        'host': host,
+        'filename': filename,
+        'linenumber': linenumber,
+    }
+
+
+def _argv(record):
+    argv = list(record.get('argv') or [])
+    # /proc shows the interpreter of a script, execve shows the script
+    interpreter = argv[0].rsplit('/', 1)[-1] if argv else ''
+    if len(argv) > 1 and not argv[1].startswith('-'):
+        if interpreter.startswith('python') or interpreter in ('sh', 'bash'):
+            argv = argv[1:]
+    return argv
+
+
+def process_rows(records, filename):
+    '''The rows strace would have left, out of procsampler's pid records
+
+    Like strace, this starts at ansible-playbook and leaves out whatever
+    else was running under julian.
+    '''
+    records = sorted(records, key=lambda x: (x['start'], x['pid']))
+    argvs = dict((x['pid'], _argv(x)) for x in records)
+    tree = set()
+    rows = []
+    for record in records:
+        pid = record['pid']
+        argv = argvs[pid]
+        if record['ppid'] in tree:
+            rows.append(_row(record['ppid'], record['start'], filename, -1, syscall='clone', clones=[pid]))
+        elif tree or not (argv and argv[0].endswith('ansible-playbook')):
+            continue
+        tree.add(pid)
+        if argv != argvs.get(record['ppid']):
+            # a fork that never exec'd still has it's parent's command line
+            host = ssh_host(argv) if argv and argv[0].endswith('ssh') else None
+            rows.append(_row(pid, record['start'], filename, -1, syscall='execve', args=argv, host=host))
+        else:
+            rows.append(_row(pid, record['start'], filename, -1))
+        rows.append(_row(pid, record['seen'], filename, -1))
+    return rows
@@ -0,0 +1,382 @@
+#!/usr/bin/env python
+
+# sysmetrics:
+#   Read the vmstat and top captures julian takes during a run.
+#
+# Samples are parsed straight into typed arrays, one per column, instead
+# of a dict per line. A file's timezone is resolved once and timestamps
+# are converted with one localize per hour of capture. top only prints the
+# time of day, so it's samples are anchored to a date (the vmstat capture
+# or the run's start) and rolled over at midnight, which puts them on the
+# same epoch timeline as the ansible events. A day of one second samples
+# can then be downsampled or smoothed without ever building the rows.
+# Captures from procsampler are already on that timeline and are turned
+# into the same vmstat and top columns, and their per process totals are
+# read back for delphiki's pid info.
+
+import calendar
+import datetime
+import json
+import math
+import re
+import time
+
+from array import array
+
+import pytz
+
+from ansible_dev_tools.stracelog import iter_line_blocks
+
+
+# procs -----------memory---------- ---swap-- -----io---- -system-- ------cpu----- -----timestamp-----
+#  r  b   swpd   free   buff  cache   si   so    bi    bo   in   cs us sy id wa st                 UTC
+#  2  0  43836 1524804  31152 278956  148   75   154    83   21    8  0  0 98  2  0 2019-02-11 16:13:04
+VMSTAT_COLUMNS = [
+    'r', 'b', 'swpd', 'free', 'buff', 'cache', 'si', 'so', 'bi', 'bo',
+    'in', 'cs', 'us', 'sy', 'id', 'wa', 'st',
+]
+
+# top - 16:13:04 up 17 days, 21:39,  1 user,  load average: 0.08, 0.03, 0.05
+# Tasks:  84 total,   2 running,  77 sleeping,   2 stopped,   2 zombie
+# KiB Mem :  1882220 total,  1513532 free,    56916 used,   311772 buff/cache
+TOP_COLUMNS = [
+    ('users', 'q'), ('load_1', 'd'), ('load_5', 'd'), ('load_15', 'd'),
+    ('tasks', 'q'), ('running', 'q'), ('sleeping', 'q'), ('stopped', 'q'), ('zombie', 'q'),
+    ('kib_mem_total', 'q'), ('kib_mem_free', 'q'), ('kib_mem_used', 'q'), ('kib_mem_buff/cache', 'q'),
+]
+TOP_RE = re.compile(r'^(?:top - |Tasks:|KiB Mem).*$', re.M)
+TOP_HEADER_RE = re.compile(r'^top - (\d+):(\d+):(\d+) .*?(\d+) users?,\s+load average: ([\d.]+), ([\d.]+), ([\d.]+)')
+
+# samples without a value for a column hold this
+INT_NULL = -2**63
+
+
+def _null(value):
+    if value == INT_NULL or value != value:
+        return None
+    return value
+
+
+def resolve_timezone(name):
+    '''A tzinfo for the zone name vmstat prints, None for local time'''
+    if not name:
+        return None
+    if name.upper() in ('UTC', 'GMT', 'Z'):
+        return pytz.utc
+    for candidate in (name, name.upper()):
+        try:
+            return pytz.timezone(candidate)
+        except pytz.UnknownTimeZoneError:
+            pass
+    # abbreviations like EDT aren't zones, they are the local time
+    return None
+
+
+class EpochConverter(object):
+
+    '''Local wall clock -> epoch, localizing once per hour'''
+
+    def __init__(self, timezone=None):
+        self.tz = timezone
+        self.hours = {}
+
+    def epoch(self, year, month, day, hour, minute, second):
+        key = (year, month, day, hour)
+        base = self.hours.get(key)
+        if base is None:
+            dt = datetime.datetime(year, month, day, hour)
+            if self.tz is None:
+                base = time.mktime(dt.timetuple())
+            elif self.tz is pytz.utc:
+                base = float(calendar.timegm(dt.timetuple()))
+            else:
+                base = self.tz.localize(dt).timestamp()
+            self.hours[key] = base
+        return base + minute * 60 + second
+
+
+class Series(object):
+
+    '''Samples of named numeric columns, stored as typed arrays'''
+
+    def __init__(self, columns, timezone=None):
+        self.names = [x[0] for x in columns]
+        self.ts = array('d')
+        self.columns = dict((name, array(code)) for (name, code) in columns)
+        self.linenumbers = array('q')
+        self.timezone = timezone
+
+    def __len__(self):
+        return len(self.ts)
+
+    def append(self, ts, values, linenumber=-1):
+        self.ts.append(ts)
+        self.linenumbers.append(linenumber)
+        for (name, value) in zip(self.names, values):
+            self.columns[name].append(value)
+
+    def value(self, name, idx):
+        return _null(self.columns[name][idx])
+
+    def rows(self, prefix=''):
+        '''A dict per sample, ts last, the way the parsers used to build them'''
+        names = self.names
+        keys = [prefix + x for x in names]
+        columns = [self.columns[x] for x in names]
+        for (idx, ts) in enumerate(self.ts):
+            row = {}
+            for (key, column) in zip(keys, columns):
+                row[key] = _null(column[idx])
+            row['ts'] = ts
+            yield row
+
+    def downsample(self, interval, how='mean'):
+        '''One sample per interval seconds, the mean (or max, min) of each bucket'''
+        agg = {'mean': lambda x: sum(x) / float(len(x)), 'max': max, 'min': min}[how]
+        result = Series([(x, 'd') for x in self.names], timezone=self.timezone)
+        if not self.ts:
+            return result
+        start = math.floor(self.ts[0] / interval) * interval
+        bucket = []
+        current = None
+        for (idx, ts) in enumerate(self.ts):
+            key = int((ts - start) // interval)
+            if key != current and bucket:
+                self._emit(result, start + current * interval, bucket, agg)
+                bucket = []
+            current = key
+            bucket.append(idx)
+        self._emit(result, start + current * interval, bucket, agg)
+        return result
+
+    def _emit(self, result, ts, bucket, agg):
+        values = []
+        for name in self.names:
+            column = [self.value(name, x) for x in bucket]
+            column = [x for x in column if x is not None]
+            values.append(agg(column) if column else float('nan'))
+        result.append(ts, values, linenumber=self.linenumbers[bucket[0]])
+
+    def rolling(self, name, window):
+        '''The mean of each sample and the window - 1 samples before it'''
+        means = array('d')
+        total = 0.0
+        count = 0
+        values = [self.value(name, x) for x in range(len(self.ts))]
+        for (idx, value) in enumerate(values):
+            if value is not None:
+                total += value
+                count += 1
+            if idx >= window:
+                old = values[idx - window]
+                if old is not None:
+                    total -= old
+                    count -= 1
+            means.append(total / count if count else float('nan'))
+        return means
+
+
+def read_vmstat(filename):
+    '''The samples of a `vmstat -t` capture'''
+    series = Series([(x, 'q') for x in VMSTAT_COLUMNS])
+    converter = EpochConverter()
+    ncols = len(VMSTAT_COLUMNS)
+    with open(filename, 'r') as f:
+        for (lineno, line) in enumerate(f):
+            cols = line.split()
+            if not cols or cols[0] == 'procs':
+                continue
+            if cols[0] == 'r':
+                # the header's last column is the timezone
+                if cols[-1] != series.timezone:
+                    series.timezone = cols[-1]
+                    converter = EpochConverter(resolve_timezone(cols[-1]))
+                continue
+            try:
+                values = [int(x) for x in cols[:ncols]]
+                (year, month, day) = cols[ncols].split('-')
+                (hour, minute, second) = cols[ncols + 1].split(':')
+            except (ValueError, IndexError):
+                continue
+            ts = converter.epoch(int(year), int(month), int(day), int(hour), int(minute), int(second))
+            series.append(ts, values, linenumber=lineno)
+    return series
+
+
+def vmstat_start(filename):
+    '''The epoch and timezone of the first vmstat sample, without reading the rest'''
+    timezone = None
+    with open(filename, 'r') as f:
+        for line in f:
+            cols = line.split()
+            if cols and cols[0] == 'r':
+                timezone = cols[-1]
+            elif cols and cols[0].isdigit() and len(cols) > len(VMSTAT_COLUMNS) + 1:
+                ncols = len(VMSTAT_COLUMNS)
+                (year, month, day) = [int(x) for x in cols[ncols].split('-')]
+                (hour, minute, second) = [int(x) for x in cols[ncols + 1].split(':')]
+                converter = EpochConverter(resolve_timezone(timezone))
+                return (converter.epoch(year, month, day, hour, minute, second), timezone)
+    return (None, timezone)
+
+
+def read_top(filename, anchor=None, timezone=None):
+    '''The summary of each `top -b` iteration
+
+    top only prints the time of day, which is put on the date of the anchor
+    epoch (in the capture's timezone) and moved to the next day each time
+    the clock goes backwards. Without an anchor the samples are on the
+    epoch's first day, as they always were.
+    '''
+
+    tz = resolve_timezone(timezone)
+    converter = EpochConverter(tz)
+    if anchor is None:
+        day = datetime.date(1970, 1, 1)
+        anchor_ts = None
+    else:
+        if tz is None:
+            day = datetime.datetime.fromtimestamp(anchor).date()
+        else:
+            day = datetime.datetime.fromtimestamp(anchor, tz).date()
+        anchor_ts = anchor
+
+    series = Series(TOP_COLUMNS, timezone=timezone)
+    current = None
+    last_ts = None
+
+    nulls = [INT_NULL if code == 'q' else float('nan') for (name, code) in TOP_COLUMNS]
+
+    def finish(sample):
+        values = [sample[2].get(x[0], null) for (x, null) in zip(TOP_COLUMNS, nulls)]
+        series.append(sample[0], values, linenumber=sample[1])
+
+    with open(filename, 'r') as f:
+        for (lineno, block) in iter_line_blocks(f):
+            counted = 0
+            for match in TOP_RE.finditer(block):
+                line = match.group()
+                lineno += block.count('\n', counted, match.start())
+                counted = match.start()
+
+                if line.startswith('top - '):
+                    header = TOP_HEADER_RE.match(line)
+                    if header is None:
+                        continue
+                    if current is not None:
+                        finish(current)
+                    (hour, minute, second) = [int(x) for x in header.groups()[:3]]
+                    ts = converter.epoch(day.year, day.month, day.day, hour, minute, second)
+                    if last_ts is None and anchor_ts is not None and ts < anchor_ts - 43200:
+                        # the capture started just after midnight
+                        ts += 86400
+                        day += datetime.timedelta(days=1)
+                    elif last_ts is not None and ts < last_ts - 43200:
+                        day += datetime.timedelta(days=1)
+                        ts = converter.epoch(day.year, day.month, day.day, hour, minute, second)
+                    last_ts = ts
+                    current = (ts, lineno, {
+                        'users': int(header.group(4)),
+                        'load_1': float(header.group(5)),
+                        'load_5': float(header.group(6)),
+                        'load_15': float(header.group(7)),
+                    })
+                elif current is None:
+                    continue
+                elif line.startswith('Tasks:'):
+                    cols = line.split()
+                    for (key, idx) in (('tasks', 1), ('running', 3), ('sleeping', 5), ('stopped', 7), ('zombie', 9)):
+                        current[2][key] = int(cols[idx])
+                else:
+                    cols = line.replace(':', ' ').split()
+                    for (key, idx) in (('kib_mem_total', 2), ('kib_mem_free', 4), ('kib_mem_used', 6), ('kib_mem_buff/cache', 8)):
+                        current[2][key] = int(cols[idx])
+
+    if current is not None:
+        finish(current)
+    return series
+
+
+def _percentages(previous, current):
+    # us sy id wa st out of the cpu jiffies spent between two samples
+    (user, nice, system, idle, iowait, irq, softirq, steal) = [
+        y - x for (x, y) in zip(previous, current)
+    ]
+    total = float(user + nice + system + idle + iowait + irq + softirq + steal) or 1.0
+    return [
+        int(round(100 * x / total))
+        for x in (user + nice, system + irq + softirq, idle, iowait, steal)
+    ]
+
+
+def read_samples(filename):
+    '''(vmstat, top) series out of a procsampler capture
+
+    The same columns vmstat and top used to print are derived from the
+    raw counters. Rates need two samples, so like vmstat's since boot
+    first line, the first sample has no vmstat row.
+    '''
+
+    vmstat = Series([(x, 'q') for x in VMSTAT_COLUMNS])
+    top = Series(TOP_COLUMNS)
+    previous = None
+
+    with open(filename, 'r') as f:
+        for (lineno, line) in enumerate(f):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # the sampler was killed halfway through a line
+                continue
+            kind = record.get('kind')
+            if kind == 'header':
+                vmstat.timezone = top.timezone = record.get('timezone')
+            if kind != 'sample':
+                continue
+
+            mem = record['mem']
+            (load_1, load_5, load_15) = record['load']
+            used = mem['MemTotal'] - mem['MemFree'] - mem['Buffers'] - mem['Cached'] - mem.get('SReclaimable', 0)
+            top.append(record['ts'], [
+                INT_NULL, load_1, load_5, load_15,
+                record['tasks'], record['procs_running'], INT_NULL, INT_NULL, INT_NULL,
+                mem['MemTotal'], mem['MemFree'], used,
+                mem['Buffers'] + mem['Cached'] + mem.get('SReclaimable', 0),
+            ], linenumber=lineno)
+
+            if previous is not None:
+                elapsed = (record['mono'] - previous['mono']) or 1.0
+                (us, sy, idle, wa, st) = _percentages(previous['cpu'], record['cpu'])
+                vmstat.append(record['ts'], [
+                    record['procs_running'], record['procs_blocked'],
+                    mem['SwapTotal'] - mem['SwapFree'], mem['MemFree'], mem['Buffers'],
+                    mem['Cached'] + mem.get('SReclaimable', 0),
+                    # swap and block io aren't sampled
+                    INT_NULL, INT_NULL, INT_NULL, INT_NULL,
+                    int(round((record['intr'] - previous['intr']) / elapsed)),
+                    int(round((record['ctxt'] - previous['ctxt']) / elapsed)),
+                    us, sy, idle, wa, st,
+                ], linenumber=lineno)
+            previous = record
+
+    return (vmstat, top)
+
+
+def read_pid_usage(filename):
+    '''{pid: totals} out of the pid records of a procsampler capture'''
+    usage = {}
+    with open(filename, 'r') as f:
+        for line in f:
+            # skip the samples without decoding them
+            if not line.startswith('{"kind":"pid"'):
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            record.pop('kind')
+            # a reused pid keeps whichever of it's processes used the most cpu
+            previous = usage.get(record['pid'])
+            if previous is None or previous['utime'] + previous['stime'] <= record['utime'] + record['stime']:
+                usage[record['pid']] = record
+    return usage
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+# timeline:
+#   Bin start/stop intervals onto a fixed resolution time axis.
+#
+# Intervals are turned into +1/-1 marks on a difference array over the bins
+# and a prefix sum gives the per-bin count, so the cost is the number of
+# intervals plus the number of bins no matter how long the intervals are.
+# The same start/stop events, sorted, give the exact concurrency curve.
+
+from bisect import bisect_left
+from bisect import bisect_right
+
+
+class Timeline(object):
+
+    '''width equal bins spanning t0 to tN'''
+
+    def __init__(self, t0, tN, width):
+        self.t0 = t0
+        self.tN = tN
+        self.width = width
+        self.bindiv = (tN - t0) / float(width)
+        # accumulate the edges so they match bins built one after another
+        edges = [t0]
+        for x in range(width):
+            edges.append(edges[-1] + self.bindiv)
+        self.edges = edges
+        self.starts = edges[:-1]
+        self.stops = edges[1:]
+
+    def bins(self):
+        return list(zip(self.starts, self.stops))
+
+    def bin_index(self, ts):
+        '''The first bin holding ts, None if ts is off the timeline'''
+        idx = bisect_left(self.stops, ts)
+        if idx >= self.width or ts < self.starts[idx]:
+            return None
+        return idx
+
+    def span(self, start, stop):
+        '''The first and last bins an interval overlaps, None if none'''
+        first = bisect_left(self.stops, start)
+        last = bisect_right(self.starts, stop) - 1
+        if first >= self.width or last < 0 or first > last:
+            return None
+        return (first, last)
+
+    def counts(self, intervals):
+        '''How many of the (start, stop) intervals overlap each bin'''
+        diff = [0] * (self.width + 1)
+        for (start, stop) in intervals:
+            span = self.span(start, stop)
+            if span is None:
+                continue
+            diff[span[0]] += 1
+            diff[span[1] + 1] -= 1
+        counts = []
+        active = 0
+        for x in diff[:-1]:
+            active += x
+            counts.append(active)
+        return counts
+
+    def point_counts(self, points):
+        '''How many of the timestamps fall into each bin'''
+        counts = [0] * self.width
+        for ts in points:
+            idx = self.bin_index(ts)
+            if idx is not None:
+                counts[idx] += 1
+        return counts
+
+
+def concurrency_curve(intervals):
+    '''[(ts, active)] at every instant the number of open intervals changes
+
+    An interval is open from it's start through it's stop, so ones that
+    touch end to end are counted as overlapping.
+    '''
+    events = []
+    for (start, stop) in intervals:
+        if start is None or stop is None:
+            continue
+        events.append((start, 0))
+        events.append((stop, 1))
+    events.sort()
+
+    curve = []
+    active = 0
+    for (ts, kind) in events:
+        active += -1 if kind else 1
+        if curve and curve[-1][0] == ts:
+            curve.pop()
+        if not curve or curve[-1][1] != active:
+            curve.append((ts, active))
+    return curve
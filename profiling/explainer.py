@@ -7,13 +7,24 @@ import sys
 
 from collections import OrderedDict
 
-def main():
-    rd = sys.argv[1]
+from ansible_dev_tools.colfile import ColumnFile
+
+
+def load_observations(rd):
+    '''delphiki's observations, mapped from disk if it exported columns'''
+    obsfile = os.path.join(rd, '.cache', 'observations.adtm')
+    if os.path.exists(obsfile):
+        return ColumnFile(obsfile, columns=['ts', 'task_name', 'host'])
+
     obsfile = os.path.join(rd, '.cache', 'observations.json')
     assert os.path.exists(obsfile)
-
     with open(obsfile, 'r') as f:
-        rows = json.loads(f.read())
+        return json.loads(f.read())
+
+
+def main():
+    rd = sys.argv[1]
+    rows = load_observations(rd)
     #rows = sorted(rows, key=lambda x: x['ts'])
 
     t0 = rows[0]['ts']
@@ -6,15 +6,32 @@ import os
 import sys
 import time
 
-import pytz
 import svgwrite
 
+from collections import OrderedDict
+
 from svgwrite import cm, mm, percent
 from svgwrite import percent as pc
 from logzero import logger
 
+from ansible_dev_tools.colfile import ColumnFile
+from ansible_dev_tools.hostlanes import LEVELS
+from ansible_dev_tools.hostlanes import build_lanes
+from ansible_dev_tools.hostlanes import group_by_host
+from ansible_dev_tools.hostlanes import host_order
+from ansible_dev_tools.hostlanes import iter_observations
+from ansible_dev_tools.sysmetrics import read_vmstat
+
+
+# pixels a host's lane needs before hosts get folded into density bands
+MIN_LANE_HEIGHT = 1.0
+# pixels each density band gets
+MIN_BAND_HEIGHT = 2.0
+# pixels between two lane labels
+LABEL_HEIGHT = 8.0
+
 
-def get_observations_from_delphiki():
+def get_observations_from_delphiki(dn):
     #fn = 'jobresults.2.7.7/.cache/observations.json'
     #fn = 'rhtestOct17/270/.cache/observations.json'
     #fn = 'rhtestOct17/242/.cache/observations.json'
@@ -22,7 +39,14 @@ def get_observations_from_delphiki():
     #fn = 'rhtest-02-14-2019/jobresults.2.4.6.0/.cache/observations.json'
     #fn = 'rhtest-02-14-2019/jobresults.2.8.0.dev0/.cache/observations.json'
 
-    dn = sys.argv[1]
+    fn = os.path.join(dn, '.cache', 'observations.adtm')
+    if os.path.exists(fn):
+        # the columns are mapped in and only decoded as they're read
+        logger.info('mapping %s' % fn)
+        obs = ColumnFile(fn, columns=['ts', 'host', 'task_name'])
+        logger.info('%s observations found' % len(obs))
+        return obs
+
     fn = os.path.join(dn, '.cache', 'observations.json')
     if not os.path.exists(fn):
         raise Exception('%s does not exist' % fn)
@@ -33,8 +57,7 @@ def get_observations_from_delphiki():
     return obs
 
 
-def get_observations_from_baseline():
-    dn = sys.argv[1]
+def get_observations_from_baseline(dn):
     fn = os.path.join(dn, 'baseline.json')
     if not os.path.exists(fn):
         raise Exception('%s does not exist' % fn)
@@ -74,7 +97,8 @@ def get_observations_from_baseline():
     for idx,x in enumerate(observations):
         ts = x['ts']
         # 2019-02-22T02:22:21.249551
-        ts = datetime.datetime.strptime(ts, '%Y-%m-%dT%H:%M:%S.%f')
+        # fromisoformat reads the same format as strptime, many times faster
+        ts = datetime.datetime.fromisoformat(ts)
         #ts = time.mktime(ts.timetuple())
         ts = ts.timestamp()
         observations[idx]['ts'] = ts
@@ -83,91 +107,58 @@ def get_observations_from_baseline():
     return observations
 
 
-def get_vmstats():
-    dn = sys.argv[1]
+def load_observations(dn):
+    '''delphiki's observations if it exported them, else the baseline's'''
+    if os.path.exists(os.path.join(dn, '.cache', 'observations.adtm')):
+        return get_observations_from_delphiki(dn)
+    if os.path.exists(os.path.join(dn, 'baseline.json')):
+        return get_observations_from_baseline(dn)
+    return get_observations_from_delphiki(dn)
+
+
+def get_vmstats(dn):
     fn = os.path.join(dn, 'vmstat.log')
     if not os.path.exists(fn):
         raise Exception('%s does not exist' % fn)
     logger.info('reading %s' % fn)
-    with open(fn, 'r') as f:
-        lines = f.readlines() 
-
-    rows = []
-    VMSTAT_TIMEZONE = None
-    for line in lines:
-        cols = line.split()
-        if cols[0] == 'procs':
-            continue
-        if cols[0] == 'r':
-            VMSTAT_TIMEZONE = cols[-1]
-            continue
-
-        data = {
-            'vmstat_r': int(cols[0]),
-            'vmstat_b': int(cols[1]),
-            'vmstat_swpd': int(cols[2]),
-            'vmstat_free': int(cols[3]),
-            'vmstat_buff': int(cols[4]),
-            'vmstat_cache': int(cols[5]),
-            'vmstat_si': int(cols[6]),
-            'vmstat_so': int(cols[7]),
-            'vmstat_bi': int(cols[8]),
-            'vmstat_bo': int(cols[9]),
-            'vmstat_in': int(cols[10]),
-            'vmstat_cs': int(cols[11]),
-            'vmstat_us': int(cols[12]),
-            'vmstat_sy': int(cols[13]),
-            'vmstat_id': int(cols[14]),
-            'vmstat_wa': int(cols[15]),
-            'vmstat_st': int(cols[16]),
-        }
-
-        # make a timezone aware timestamp
-        ts = cols[17] + ' ' + cols[18]
-        tstmp = datetime.datetime.strptime(ts, '%Y-%m-%d %H:%M:%S')
+    return list(read_vmstat(fn).rows(prefix='vmstat_'))
 
-        try:
-            tz = getattr(pytz, VMSTAT_TIMEZONE.lower())
-        except AttributeError as e:
-            tz = pytz.timezone(VMSTAT_TIMEZONE.upper())
 
-        tzts = datetime.datetime(tstmp.year, tstmp.month, tstmp.day, tstmp.hour, tstmp.minute, tstmp.second, tzinfo=tz)
-
-        data['ts'] = tzts.timestamp()
-        rows.append(data)
-
-    return rows
 
+def path_data(marks, lane_height, band):
+    '''One path's d for [(x0, x1, y)], a line at y or a band from y down'''
+    if band:
+        parts = []
+        for (x0, x1, y) in marks:
+            w = max(x1 - x0, 0.5)
+            parts.append('M%.1f %.1fh%.1fv%.1fh%.1fz' % (x0, y, w, lane_height, -w))
+        return ''.join(parts)
+    return ''.join('M%.1f %.1fH%.1f' % (x0, y, max(x1, x0 + 0.5)) for (x0, x1, y) in marks)
 
 
 def main():
 
-    #obs = get_observations_from_delphiki()
-    obs = get_observations_from_baseline()
-    #vmstat_obs = get_vmstats()
+    obs = load_observations(sys.argv[1])
+    #vmstat_obs = get_vmstats(sys.argv[1])
     #fn = None
     fn = sys.argv[1]
 
-    hostnames = [x['host'] for x in obs if x.get('host')]
-    hostnames = sorted(set(hostnames))
+    # one pass splits the observations by host and finds the task starts
+    (hosts, taskstarts) = group_by_host(obs)
+    hostnames = host_order(hosts)
     logger.info('%s hostnames found' % len(hostnames))
-    hostmap = {}
-    for row in obs:
-        if not row.get('host'):
-            continue
-        if not row['host'][0].isalpha():
-            continue
-        if row['host'] not in hostmap or hostmap[row['host']] > row['ts']:
-            hostmap[row['host']] = row['ts']
-    #import epdb; epdb.st()
-    hostnames = sorted(hostmap, key=lambda x: x[1])
 
     # need to know total duration
-    t0 = min([x['ts'] for x in obs])
-    tN = max([x['ts'] for x in obs])
-    tT = tN - t0
-    #tT = 40
-    tT = 100
+    t0 = None
+    tN = None
+    for (ts, host, task) in iter_observations(obs):
+        if ts is None:
+            continue
+        if t0 is None or ts < t0:
+            t0 = ts
+        if tN is None or ts > tN:
+            tN = ts
+    tT = (tN - t0) or 1.0
     logger.info('%ss total time' % tT)
 
     colors = ['red', 'lightgreen', 'lightblue', 'orange', 'purple', 'yellow']
@@ -184,8 +175,17 @@ def main():
     bpad = 5
     tD = tT / (100 - lpad - rpad)
 
-    # the main drawing object
-    dwg = svgwrite.Drawing('graph.svg', (width, height), debug=True)
+    # the plot area in pixels, what the level of detail is worked out from
+    px0 = width * lpad / 100.0
+    pxwidth = width * (100 - lpad - rpad) / 100.0
+    py0 = height * tpad / 100.0
+    pyheight = height * (100 - tpad - bpad) / 100.0
+
+    def xpixel(ts):
+        return px0 + (ts - t0) * pxwidth / tT
+
+    # the main drawing object, validating millions of attributes takes minutes
+    dwg = svgwrite.Drawing('graph.svg', (width, height), debug=False)
     # black is prettier
     dwg.add(dwg.rect(size=('100%','100%'), class_='background', fill='black'))
     # note which file this was
@@ -203,52 +203,56 @@ def main():
     # bottom
     axiis.add(dwg.line(start=(pc(lpad),pc(100-bpad)), end=(pc(100-rpad), pc(100-bpad))))
 
-    # make a division for each host
-    hostdivs = {}
-    hostdivs_bin = (100 - tpad - bpad) / (len(hostnames) + 1)
-
-    # mark each host and a line for it
-    _axiis = dwg.add(dwg.g(id='axiis', stroke='lightgray'))
-    y = tpad + hostdivs_bin
-    for idh,hn in enumerate(hostnames):
-        hostdivs[hn] = y
-        #_axiis.add(dwg.line(start=(pc(lpad), pc(y)), end=(pc(100-rpad), pc(y))))
-        pg = dwg.add(dwg.g(font_size=8, stroke='white'))
-        pg.add(dwg.text(hn + ' ' + str(idh), (pc(lpad-3), pc(y))))
-        y += hostdivs_bin
+    # a lane per host, unless that makes them thinner than a pixel, then
+    # neighbouring hosts share a density band
+    nlanes = len(hostnames)
+    if (nlanes + 1) * MIN_LANE_HEIGHT > pyheight:
+        nlanes = int(pyheight / MIN_BAND_HEIGHT) - 1
+    band = nlanes < len(hostnames)
+    (lanes, blocks) = build_lanes(hosts, hostnames, nlanes, mingap=tT / pxwidth)
+    lane_height = pyheight / (len(lanes) + 1)
+    if band:
+        logger.info('%s hosts drawn as %s density bands' % (len(hostnames), len(lanes)))
+
+    # mark each lane, skipping labels that would overlap the last one
+    pg = dwg.add(dwg.g(font_size=8, stroke='white'))
+    lastlabel = None
+    for (idl, lane) in enumerate(lanes):
+        y = py0 + lane_height * (idl + 1)
+        if lastlabel is not None and y - lastlabel < LABEL_HEIGHT:
+            continue
+        lastlabel = y
+        if band:
+            label = '%s .. %s' % (lane[0], lane[-1])
+        else:
+            label = lane[0] + ' ' + str(idl)
+        pg.add(dwg.text(label, (pc(lpad-3), round(y, 1))))
 
     # mark each task start
     taskmap = {}
     _colors = colors[:]
-    thistask = None
     taskcount = 0
-    totalrows = len(obs)
-    for idr,row in enumerate(obs):
-        if row.get('task_name'):
-            tn = row.get('task_name')
-            ts = row['ts']
-            if not thistask or thistask != tn:
-                # set the color
-                if not _colors:
-                    _colors = colors[:]
-                taskmap[tn] = _colors[0]
-                _colors.remove(_colors[0])
-                thistask = tn
-                taskcount += 1
-                logger.info('[%s] task-%s %s' % (ts, taskcount, tn))
-
-                # find x position
-                xp = lpad + ((ts - t0) / tD)
-
-                # label header
-                pg = dwg.add(dwg.g(font_size=8, stroke=taskmap[tn]))
-                pg.add(dwg.text('task-%s' % taskcount, (pc(xp+.1), pc(tpad-2))))
-                # label footer
-                pg.add(dwg.text('%s' % round((ts-t0), 4), (pc(xp+.1), pc(100-bpad+2))))
-
-                # divline
-                _axiis = dwg.add(dwg.g(id='axiis', stroke=taskmap[tn]))
-                _axiis.add(dwg.line(start=(pc(xp),pc(tpad-2)), end=(pc(xp),pc(100-bpad+2))))
+    for (tn, ts) in taskstarts.items():
+        # set the color
+        if not _colors:
+            _colors = colors[:]
+        taskmap[tn] = _colors[0]
+        _colors.remove(_colors[0])
+        taskcount += 1
+        logger.info('[%s] task-%s %s' % (ts, taskcount, tn))
+
+        # find x position
+        xp = lpad + ((ts - t0) / tD)
+
+        # label header
+        pg = dwg.add(dwg.g(font_size=8, stroke=taskmap[tn]))
+        pg.add(dwg.text('task-%s' % taskcount, (pc(xp+.1), pc(tpad-2))))
+        # label footer
+        pg.add(dwg.text('%s' % round((ts-t0), 4), (pc(xp+.1), pc(100-bpad+2))))
+
+        # divline
+        _axiis = dwg.add(dwg.g(id='axiis', stroke=taskmap[tn]))
+        _axiis.add(dwg.line(start=(pc(xp),pc(tpad-2)), end=(pc(xp),pc(100-bpad+2))))
 
     logger.info('%s total tasks' % taskcount)
 
@@ -257,52 +261,23 @@ def main():
     _axiis = dwg.add(dwg.g(id='axiis', stroke='gray'))
     _axiis.add(dwg.line(start=(pc(xp),pc(tpad-2)), end=(pc(xp),pc(100-bpad+2))))
 
-    # mark each host start+stop per task
-    threshold = 60.0
-    total = 0
-    marks = []
-    for hn in hostnames:
-        lastts = None
-        lastmark = None
-        for idr,row in enumerate(obs):
-            if row['host'] != hn:
-                continue
-
-            if not row['task_name']:
-                continue
-
-            ts = row['ts']
-            xpos = lpad + ((ts - t0) / tD)
-            ypos = hostdivs[hn]
-
-            if lastmark is None:
-                lastmark = (xpos, ypos)
-                continue
-
-            # what color?
-            tc = taskmap[row['task_name']]
-            #_axiis = dwg.add(dwg.g(id='axiis', stroke=tc, stroke_width=pc(hostdivs_bin * .4)))
-            _axiis = dwg.add(dwg.g(id='axiis', stroke=tc))
-            _axiis.add(dwg.line(start=(pc(lastmark[0]), pc(lastmark[1])), end=(pc(xpos), pc(ypos))))
-
-            marks.append(
-                ((pc(lastmark[0]), pc(lastmark[1])), (pc(xpos), pc(ypos)))
-            )
-
-            '''
-            xtotal = xpos - lastmark[0]
-            xtotal = round((xtotal / tT) * 100, 2)
-            #print(xtotal)
-            if xtotal > 2:
-                pg = dwg.add(dwg.g(font_size=8, stroke='white'))
-                pg.add(dwg.text('%s%%' % xtotal, (pc(xpos-1), pc(ypos))))
-            #import epdb; epdb.st()
-            '''
-
-            lastmark = None
-            total += 1
+    # mark each host start+stop per task, one path per task and fill level
+    paths = OrderedDict()
+    for (tn, level, idl, start, stop) in blocks:
+        y = py0 + lane_height * (idl + 1)
+        if band:
+            # the band is centered on the lane's line
+            y -= lane_height / 2
+        paths.setdefault((tn, level), []).append((xpixel(start), xpixel(stop), y))
+    logger.info('%s segments in %s paths' % (len(blocks), len(paths)))
+
+    for ((tn, level), marks) in paths.items():
+        d = path_data(marks, lane_height, band)
+        if band:
+            dwg.add(dwg.path(d=d, fill=taskmap[tn], fill_opacity=round(level / float(LEVELS), 3)))
+        else:
+            dwg.add(dwg.path(d=d, stroke=taskmap[tn], fill='none'))
 
-    #import epdb; epdb.st()
     dwg.save()
 
 
@@ -0,0 +1,25 @@
+# julian puts this directory on PYTHONPATH when JULIAN_PYPROFILE is set, so
+# every python it starts runs this first. Only ansible-playbook gets profiled.
+
+import os
+import sys
+
+try:
+    from ansible_dev_tools import pyprofile
+    pyprofile.install()
+except Exception as e:
+    sys.stderr.write('pyprofile: not profiling %s: %s\n' % (os.getpid(), e))
+
+# let the sitecustomize this one shadows run too
+_here = os.path.dirname(os.path.abspath(__file__))
+_path = sys.path[:]
+_module = sys.modules.pop(__name__, None)
+sys.path[:] = [x for x in sys.path if os.path.abspath(x or '.') != _here]
+try:
+    import sitecustomize
+except ImportError:
+    pass
+finally:
+    sys.path[:] = _path
+    if _module is not None:
+        sys.modules[__name__] = _module
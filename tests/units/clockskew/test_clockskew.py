@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+import math
+import random
+
+import unittest
+
+from ansible_dev_tools.clockskew import controller_invocations
+from ansible_dev_tools.clockskew import estimate_clock_skew
+from ansible_dev_tools.clockskew import remote_invocations
+
+
+def simulate(offset, drift=0.0, count=200, seed=1):
+    '''Controller invocations and the whole second remote syslog of them'''
+    rand = random.Random(seed)
+    modules = ['ansible-command', 'ansible-copy', 'ansible-setup']
+    local = []
+    remote = []
+    ts = 1543300000.0
+    for x in range(count):
+        ts += rand.uniform(0.5, 20.0)
+        module = rand.choice(modules)
+        local.append((ts, module))
+        # the module logs a little after the controller starts it
+        rts = ts + 0.05 - offset
+        rts -= drift * (rts - 1543300000.0)
+        remote.append((math.floor(rts), module))
+    return (local, remote)
+
+
+class TestClockSkew(unittest.TestCase):
+
+    def test_offset(self):
+        (local, remote) = simulate(12.3)
+        skew = estimate_clock_skew(local, remote)
+        self.assertAlmostEqual(skew.offset, 12.3 + 0.45, delta=0.3)
+        self.assertEqual(skew.drift, 0.0)
+        self.assertLess(skew.residual, 0.5)
+        self.assertEqual(skew.matches, 200)
+
+    def test_offset_ignores_rotated_and_unmatched_lines(self):
+        (local, remote) = simulate(-40.0)
+        remote = remote[50:] + [(1543300500.0, 'ansible-yum')]
+        skew = estimate_clock_skew(local, remote)
+        self.assertAlmostEqual(skew.offset, -40.0 + 0.45, delta=0.3)
+        self.assertLess(skew.matches, 200)
+
+    def test_drift(self):
+        (local, remote) = simulate(5.0, drift=500e-6, count=400)
+        skew = estimate_clock_skew(local, remote, drift=True)
+        self.assertAlmostEqual(skew.drift, 500e-6, delta=50e-6)
+        self.assertLess(skew.residual, 0.5)
+        # an offset alone can't follow the drift
+        self.assertGreater(estimate_clock_skew(local, remote).residual, skew.residual)
+
+    def test_nothing_to_match(self):
+        self.assertIsNone(estimate_clock_skew([], [(1.0, None)]))
+
+
+class TestInvocations(unittest.TestCase):
+
+    def test_extract(self):
+        local = controller_invocations([
+            (1.0, "<node1> SSH: EXEC ssh -C node1 '/bin/sh -c '\"'\"'/usr/bin/python2.7 "
+                  "/root/.ansible/tmp/ansible-tmp-1/AnsiballZ_command.py && sleep 0'\"'\"''"),
+            (2.0, '<node1> PUT /tmp/tmpx TO /root/.ansible/tmp/ansible-tmp-1/AnsiballZ_command.py'),
+        ])
+        self.assertEqual(local, [(1.0, 'ansible-command')])
+        remote = remote_invocations([
+            (3.0, 'Nov 27 10:33:12 node1 ansible-command: Invoked with _raw_params=uptime'),
+            (4.0, 'Nov 27 10:33:12 node1 sshd[1]: Accepted publickey'),
+        ])
+        self.assertEqual(remote, [(3.0, 'ansible-command')])
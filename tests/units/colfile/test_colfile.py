@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import tempfile
+
+import unittest
+
+from ansible_dev_tools import colfile
+from ansible_dev_tools.colfile import ColumnFile
+from ansible_dev_tools.colfile import ColumnWriter
+
+
+COLUMNS = [('ts', 'd'), ('pid', 'q'), ('strace', 'b'), ('host', 's')]
+
+ROWS = [
+    (1539307779.17295, 7705, True, 'sshd_1'),
+    (1539307779.5, None, False, None),
+    (None, -1, None, 'sshd_2'),
+    (1539307780.0, 2**40, True, 'sshd_1'),
+]
+
+
+class TestColumnFile(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'observations.adtm')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, rows):
+        with ColumnWriter(self.path, COLUMNS) as writer:
+            for row in rows:
+                writer.append(row)
+
+    def test_round_trip(self):
+        self.write(ROWS)
+        self.assertEqual(os.listdir(self.tmpdir), ['observations.adtm'])
+        with ColumnFile(self.path) as cf:
+            self.assertEqual(len(cf), 4)
+            self.assertEqual(
+                [tuple(x[k] for (k, t) in COLUMNS) for x in cf],
+                ROWS
+            )
+            self.assertEqual(cf[-1]['pid'], 2**40)
+            self.assertEqual(cf['host'][:2], ['sshd_1', None])
+            self.assertRaises(IndexError, cf.__getitem__, 4)
+
+    def test_selected_columns(self):
+        self.write(ROWS)
+        with ColumnFile(self.path, columns=['ts', 'host']) as cf:
+            self.assertEqual(cf[0], {'ts': 1539307779.17295, 'host': 'sshd_1'})
+        self.assertRaises(KeyError, ColumnFile, self.path, columns=['nope'])
+
+    def test_spooled_batches(self):
+        orig = colfile.SPOOL_ROWS
+        colfile.SPOOL_ROWS = 3
+        try:
+            self.write(ROWS * 5)
+        finally:
+            colfile.SPOOL_ROWS = orig
+        with ColumnFile(self.path) as cf:
+            self.assertEqual(list(cf['pid']), [x[1] for x in ROWS * 5])
+
+    def test_empty(self):
+        self.write([])
+        with ColumnFile(self.path) as cf:
+            self.assertEqual(len(cf), 0)
+            self.assertEqual(list(cf), [])
+
+    def test_not_a_column_file(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'[{"ts": 1.0}]' * 4)
+        self.assertRaises(ValueError, ColumnFile, self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+
+import unittest
+
+from collections import OrderedDict
+
+from ansible_dev_tools import columnar
+
+
+class TestColumnarRoundTrip(unittest.TestCase):
+
+    rows = [
+        {'ts': 1539307779.17295, 'pid': 7705, 'line': 'a', 'cp': True},
+        {'pid': 7706, 'ts': None, 'line': 'b'},
+        {'host': 'sshd_1', 'line': 'a', 'hosts': ['sshd_1', 'sshd_2']},
+        {'ts': float('inf'), 'pid': -1, 'cp': False, 'mixed': 1},
+        {'mixed': 'one', 'line': None},
+    ]
+
+    def test_rows_load_back_unchanged(self):
+        data = columnar.encode_table(self.rows)
+        self.assertEqual(columnar.decode_table(data), self.rows)
+
+    def test_key_order_is_kept(self):
+        loaded = columnar.decode_table(columnar.encode_table(self.rows))
+        self.assertEqual(
+            [list(x.keys()) for x in loaded],
+            [list(x.keys()) for x in self.rows]
+        )
+
+    def test_tables(self):
+        tables = OrderedDict([('rows', self.rows), ('empty', []), ('more', [{'x': 1}])])
+        loaded = columnar.loads(columnar.dumps(tables))
+        self.assertEqual(list(loaded.keys()), ['rows', 'empty', 'more'])
+        self.assertEqual(loaded, tables)
+
+    def test_bad_magic(self):
+        import zlib
+        self.assertRaises(ValueError, columnar.loads, zlib.compress(b'nope'))
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import tempfile
+
+import unittest
+
+from ansible_dev_tools.colfile import ColumnFile
+from ansible_dev_tools.colfile import ColumnWriter
+from ansible_dev_tools.colfile import FLOAT
+from ansible_dev_tools.colfile import STRING
+from ansible_dev_tools.hostlanes import LEVELS
+from ansible_dev_tools.hostlanes import build_lanes
+from ansible_dev_tools.hostlanes import group_by_host
+from ansible_dev_tools.hostlanes import host_order
+from ansible_dev_tools.hostlanes import host_segments
+from ansible_dev_tools.hostlanes import merge_segments
+
+
+OBS = [
+    {'ts': 0.0, 'host': None, 'task_name': None},
+    {'ts': 1.0, 'host': 'el7host', 'task_name': 'setup'},
+    {'ts': 1.5, 'host': 'alpha', 'task_name': 'setup'},
+    {'ts': 2.0, 'host': 'el7host', 'task_name': 'setup'},
+    {'ts': 2.5, 'host': 'alpha', 'task_name': 'setup'},
+    {'ts': 3.0, 'host': '10.0.0.1', 'task_name': 'ping'},
+    {'ts': 3.0, 'host': 'el7host', 'task_name': 'ping'},
+    {'ts': 4.0, 'host': 'el7host', 'task_name': 'ping'},
+    {'ts': 5.0, 'host': None, 'task_name': None},
+]
+
+
+class TestGrouping(unittest.TestCase):
+
+    def test_group_by_host(self):
+        (hosts, tasks) = group_by_host(OBS)
+        self.assertEqual(sorted(hosts), ['alpha', 'el7host'])
+        self.assertEqual(hosts['el7host'], [(1.0, 'setup'), (2.0, 'setup'), (3.0, 'ping'), (4.0, 'ping')])
+        self.assertEqual(list(tasks.items()), [('setup', 1.0), ('ping', 3.0)])
+        self.assertEqual(host_order(hosts), ['el7host', 'alpha'])
+
+    def test_group_a_column_file(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            fn = os.path.join(tmpdir, 'observations.adtm')
+            with ColumnWriter(fn, [('ts', FLOAT), ('host', STRING), ('task_name', STRING)]) as writer:
+                for row in OBS:
+                    writer.append([row['ts'], row['host'], row['task_name']])
+            with ColumnFile(fn) as obs:
+                self.assertEqual(group_by_host(obs), group_by_host(OBS))
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+class TestSegments(unittest.TestCase):
+
+    def test_merge_segments(self):
+        segments = [(5, 6), (0, 1), (1.5, 2), (0.5, 1.2)]
+        self.assertEqual(merge_segments(segments), [(0, 1.2), (1.5, 2), (5, 6)])
+        self.assertEqual(merge_segments(segments, mingap=0.5), [(0, 2), (5, 6)])
+
+    def test_host_segments(self):
+        events = [(1, 'a'), (2, 'a'), (3, 'b'), (4, 'b'), (4.1, 'a'), (5, 'a')]
+        segments = host_segments(events)
+        self.assertEqual(segments['a'], [(1, 2), (4.1, 5)])
+        self.assertEqual(segments['b'], [(3, 4)])
+        # a gap under a pixel is closed, the task in between is drawn over it
+        segments = host_segments(events, mingap=3)
+        self.assertEqual(segments['a'], [(1, 5)])
+
+
+class TestLanes(unittest.TestCase):
+
+    def setUp(self):
+        self.hosts = {}
+        for idh in range(8):
+            # half the hosts spend 1s in the task, the other half 2s
+            self.hosts['host%s' % idh] = [(0.0, 'a'), (1.0 + idh % 2, 'a')]
+        self.hostnames = sorted(self.hosts)
+
+    def test_a_lane_per_host(self):
+        (lanes, blocks) = build_lanes(self.hosts, self.hostnames, 8)
+        self.assertEqual(lanes, [[x] for x in self.hostnames])
+        self.assertEqual(len(blocks), 8)
+        self.assertTrue(all(x[1] == LEVELS for x in blocks))
+        self.assertEqual(blocks[1], ('a', LEVELS, 1, 0.0, 2.0))
+
+    def test_density_bands(self):
+        (lanes, blocks) = build_lanes(self.hosts, self.hostnames, 3)
+        self.assertEqual([len(x) for x in lanes], [3, 3, 2])
+        self.assertEqual(len(blocks), 3)
+        # host0..2 are busy for 1 + 2 + 1 of 3 * 2 seconds
+        self.assertEqual(blocks[0], ('a', 6, 0, 0.0, 2.0))
+        # host6 and host7 for 1 + 2 of 2 * 2 seconds
+        self.assertEqual(blocks[2], ('a', 6, 2, 0.0, 2.0))
+
+    def test_density_band_splits_on_gaps(self):
+        hosts = {'x': [(0, 'a'), (1, 'a')], 'y': [(5, 'a'), (6, 'a')]}
+        (lanes, blocks) = build_lanes(hosts, ['x', 'y'], 1)
+        self.assertEqual(blocks, [('a', 4, 0, 0, 1), ('a', 4, 0, 5, 6)])
+        (lanes, blocks) = build_lanes(hosts, ['x', 'y'], 1, mingap=5)
+        self.assertEqual(blocks, [('a', 2, 0, 0, 6)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import tempfile
+import time
+
+import unittest
+
+from ansible_dev_tools.logcache import LogCache
+from ansible_dev_tools.logcache import fingerprint
+
+
+class TestLogCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.logfile = os.path.join(self.tmpdir, 'stdout.log')
+        with open(self.logfile, 'w') as f:
+            f.write(' 1 1.0: starting run\n')
+        self.cache = LogCache(os.path.join(self.tmpdir, '.cache'), max_bytes=350)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_store_and_load(self):
+        key = self.cache.key([self.logfile], False)
+        self.assertIsNone(self.cache.load(key))
+        self.cache.store(key, b'parsed')
+        self.assertEqual(self.cache.load(key), b'parsed')
+        self.cache.invalidate(key)
+        self.assertIsNone(self.cache.load(key))
+
+    def test_key_changes_with_content_and_options(self):
+        key = self.cache.key([self.logfile], False)
+        self.assertNotEqual(key, self.cache.key([self.logfile], True))
+        with open(self.logfile, 'a') as f:
+            f.write(' 1 2.0: done\n')
+        self.assertNotEqual(key, self.cache.key([self.logfile], False))
+
+    def test_key_sees_same_size_rewrites(self):
+        key = self.cache.key([self.logfile], False)
+        self.assertEqual(key, self.cache.key([self.logfile], False))
+        # a rewrite with the same size and the old mtime put back
+        st = os.stat(self.logfile)
+        with open(self.logfile, 'w') as f:
+            f.write(' 2 1.0: starting run\n')
+        os.utime(self.logfile, ns=(st.st_atime_ns, st.st_mtime_ns))
+        self.assertNotEqual(key, self.cache.key([self.logfile], False))
+
+    def test_fingerprint_reads_both_ends(self):
+        with open(self.logfile, 'wb') as f:
+            f.write(b'a' * 1000)
+        before = fingerprint(self.logfile, 1000, nbytes=100)
+        # the middle is not read
+        with open(self.logfile, 'r+b') as f:
+            f.seek(500)
+            f.write(b'b')
+        self.assertEqual(before, fingerprint(self.logfile, 1000, nbytes=100))
+        with open(self.logfile, 'r+b') as f:
+            f.seek(950)
+            f.write(b'b')
+        self.assertNotEqual(before, fingerprint(self.logfile, 1000, nbytes=100))
+
+    def test_lru_eviction(self):
+        for (idx, key) in enumerate(['a', 'b', 'c']):
+            self.cache.store(key, b'x' * 100)
+            os.utime(self.cache.path(key), (time.time() + idx, time.time() + idx))
+        # touching "a" makes "b" the oldest
+        self.cache.load('a')
+        os.utime(self.cache.path('a'), (time.time() + 10, time.time() + 10))
+        self.cache.store('d', b'x' * 100)
+        self.assertIsNone(self.cache.load('b'))
+        self.assertEqual(self.cache.load('a'), b'x' * 100)
+        self.assertEqual(self.cache.load('c'), b'x' * 100)
+        self.assertEqual(self.cache.load('d'), b'x' * 100)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+
+import unittest
+
+from ansible_dev_tools.logclassifier import classify_line
+from ansible_dev_tools.logclassifier import classify_48378_line
+from ansible_dev_tools.logclassifier import split_48378_marker
+from ansible_dev_tools.logclassifier import split_executor_line
+from ansible_dev_tools.logclassifier import split_ssh_exec
+from ansible_dev_tools.logclassifier import EXECUTOR_START
+from ansible_dev_tools.logclassifier import EXECUTOR_STOP
+from ansible_dev_tools.logclassifier import HOST_LINE
+from ansible_dev_tools.logclassifier import PID_LINE
+from ansible_dev_tools.logclassifier import PLAY_HEADER
+from ansible_dev_tools.logclassifier import PYLOG
+from ansible_dev_tools.logclassifier import SCHEMA_48378
+from ansible_dev_tools.logclassifier import SSH_EXEC
+from ansible_dev_tools.logclassifier import TASK_HEADER
+
+
+START = (
+    '2018-10-12 01:29:39,173 p=5489 u=vagrant |    7705 1539307779.17295: '
+    'running TaskExecutor() for sshd_145/TASK: Check for /usr/local/sync (Target Directory)\n'
+)
+STOP = (
+    '2018-10-12 01:29:39,654 p=5489 u=vagrant |    7591 1539307779.65405: '
+    'done running TaskExecutor() for sshd_60/TASK: Check for /usr/local/sync '
+    '(Target Directory) [525400a6-0421-65e9-9a84-000000000032]\n'
+)
+SSH = (
+    '<dockerhost> SSH: EXEC sshpass -d90 ssh -vvv -C -o ControlMaster=auto '
+    '-o ControlPersist=60s -o StrictHostKeyChecking=no -o Port=33017 '
+    '-o User=root -o ConnectTimeout=10 -o ControlPath=/home/vagrant/.ansible/cp/da9b210846 '
+    'dockerhost \'/bin/sh -c \'"\'"\'echo ~root && sleep 0\'"\'"\'\'\n'
+)
+
+
+class TestClassifyLine(unittest.TestCase):
+
+    def test_executor_start(self):
+        record = classify_line(START)
+        self.assertEqual(record.kind, EXECUTOR_START)
+        self.assertEqual(record.pid, 7705)
+        self.assertEqual(record.ts, 1539307779.17295)
+        self.assertEqual(record.host, 'sshd_145')
+        self.assertEqual(record.name, 'Check for /usr/local/sync (Target Directory)')
+        self.assertIsNone(record.uuid)
+
+    def test_executor_stop(self):
+        record = classify_line(STOP)
+        self.assertEqual(record.kind, EXECUTOR_STOP)
+        self.assertEqual(record.host, 'sshd_60')
+        self.assertEqual(record.uuid, '525400a6-0421-65e9-9a84-000000000032')
+
+    def test_pylog_without_pid(self):
+        line = '2018-10-12 01:29:39,655 p=5489 u=vagrant |  Using module file /tmp/command.py\n'
+        record = classify_line(line)
+        self.assertEqual(record.kind, PYLOG)
+        self.assertEqual(record.pid, 5489)
+        self.assertIsNone(record.ts)
+
+    def test_stdout_executor_is_a_pid_line(self):
+        line = '  7705 1539307779.17295: running TaskExecutor() for sshd_145/TASK: setup\n'
+        record = classify_line(line)
+        self.assertEqual(record.kind, PID_LINE)
+        self.assertEqual(record.pid, 7705)
+
+    def test_headers(self):
+        self.assertEqual(classify_line('TASK [setup] ********\n').kind, TASK_HEADER)
+        self.assertEqual(classify_line('TASK [setup] ********\n').name, 'setup')
+        self.assertEqual(classify_line('PLAY [all] ********\n').name, 'all')
+        self.assertEqual(classify_line('PLAY [all] ********\n').kind, PLAY_HEADER)
+
+    def test_ssh_and_host_lines(self):
+        self.assertEqual(classify_line(SSH).kind, SSH_EXEC)
+        self.assertEqual(classify_line(SSH).host, 'dockerhost')
+        record = classify_line("<dockerhost> (0, b'/root\\n', b'')\n")
+        self.assertEqual(record.kind, HOST_LINE)
+        self.assertEqual(record.host, 'dockerhost')
+
+    def test_48378(self):
+        line = '  5128 1543680532.73490 [sshd_1]: in run() - task f45c89b5-63bd-c3ea-c4db-000000000011\n'
+        self.assertEqual(classify_line(line).kind, SCHEMA_48378)
+        self.assertEqual(classify_48378_line(line).host, 'sshd_1')
+        self.assertEqual(
+            split_48378_marker(line),
+            ('task_uuid', 'f45c89b5-63bd-c3ea-c4db-000000000011')
+        )
+
+    def test_ignored(self):
+        self.assertIsNone(classify_line('ok: [sshd_1]\n'))
+        self.assertIsNone(classify_line('\n'))
+
+
+class TestSplitters(unittest.TestCase):
+
+    def test_split_executor_line(self):
+        data = split_executor_line(STOP)
+        self.assertEqual(data['ppid'], 5489)
+        self.assertEqual(data['pid'], 7591)
+        self.assertEqual(data['uid'], 'vagrant')
+        self.assertEqual(data['host'], 'sshd_60')
+        self.assertEqual(data['task'], 'Check for /usr/local/sync (Target Directory)')
+
+    def test_split_ssh_exec(self):
+        data = split_ssh_exec(SSH)
+        self.assertEqual(data['hostname'], 'dockerhost')
+        self.assertEqual(data['port'], '33017')
+        self.assertEqual(data['user'], 'root')
+        self.assertEqual(data['timeout'], '10')
+        self.assertEqual(data['cp_path'], '/home/vagrant/.ansible/cp/da9b210846')
+        self.assertFalse(data['hostkey_checking'])
+        self.assertTrue(data['sshpass'])
+        self.assertTrue(data['cp'])
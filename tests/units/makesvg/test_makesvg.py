@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+
+import json
+import os
+import shutil
+import tempfile
+
+import unittest
+
+from importlib.machinery import SourceFileLoader
+from importlib.util import module_from_spec
+from importlib.util import spec_from_loader
+
+from ansible_dev_tools.colfile import ColumnFile
+from ansible_dev_tools.hostlanes import LEVELS
+from ansible_dev_tools.hostlanes import build_lanes
+from ansible_dev_tools.hostlanes import group_by_host
+from ansible_dev_tools.hostlanes import host_order
+
+
+PROFILING = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'profiling')
+
+
+def load_script(name, filename):
+    '''Import one of the profiling scripts as a module'''
+    loader = SourceFileLoader(name, os.path.join(PROFILING, filename))
+    module = module_from_spec(spec_from_loader(name, loader))
+    loader.exec_module(module)
+    return module
+
+
+delphiki = load_script('delphiki', 'delphiki')
+makesvg = load_script('makesvg', 'makesvg.py')
+
+
+ROWS = [
+    {'ts': 10.0, 'pid': 1, 'stdout': True, 'task_name': None, 'host': None},
+    {'ts': 11.0, 'pid': 2, 'stdout': True, 'task_name': 'setup', 'host': 'el7host'},
+    {'ts': 11.5, 'pid': 3, 'stdout': True, 'task_name': 'setup', 'host': 'alpha'},
+    {'ts': 12.0, 'pid': 2, 'stdout': True, 'task_name': 'setup', 'host': 'el7host'},
+    {'ts': 13.0, 'pid': 3, 'stdout': True, 'task_name': 'setup', 'host': 'alpha'},
+    {'ts': 14.0, 'pid': 4, 'stdout': True, 'task_name': 'ping', 'host': 'el7host'},
+    {'ts': 15.0, 'pid': 4, 'stdout': True, 'task_name': 'ping', 'host': 'el7host'},
+    {'ts': None, 'pid': 5, 'stdout': True, 'task_name': 'ping', 'host': 'el7host'},
+]
+
+
+class DelphikiJob(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def export(self, rows):
+        '''Have delphiki write the observations.adtm of some rows'''
+        db = delphiki.InMemDB(cachedir=os.path.join(self.tmpdir, '.cache'), options='[]')
+        for row in rows:
+            db.add_row(dict(row))
+        db.finalize()
+        db.graph_fork_timeseries()
+        db.odb.conn.close()
+
+
+class TestLoadObservations(DelphikiJob):
+
+    def write_baseline(self):
+        baseline = [{
+            'play': {'duration': {'start': '2019-02-22T02:22:20.000000', 'end': '2019-02-22T02:22:30.000000'}},
+            'tasks': [{
+                'task': {'name': 'setup'},
+                'hosts': {'el7host': {'duration': {
+                    'start': '2019-02-22T02:22:21.000000', 'end': '2019-02-22T02:22:22.000000'
+                }}},
+            }],
+        }]
+        with open(os.path.join(self.tmpdir, 'baseline.json'), 'w') as f:
+            f.write(json.dumps(baseline))
+
+    def test_adtm_from_graph_fork_timeseries(self):
+        self.export(ROWS)
+        obs = makesvg.load_observations(self.tmpdir)
+        self.assertIsInstance(obs, ColumnFile)
+        self.assertEqual(list(obs.column('ts')), [10.0, 11.0, 11.5, 12.0, 13.0, 14.0, 15.0])
+        (hosts, tasks) = group_by_host(obs)
+        self.assertEqual(hosts['alpha'], [(11.5, 'setup'), (13.0, 'setup')])
+        self.assertEqual(list(tasks.items()), [('setup', 11.0), ('ping', 14.0)])
+        obs.close()
+
+    def test_adtm_wins_over_baseline(self):
+        self.write_baseline()
+        self.assertIsInstance(makesvg.load_observations(self.tmpdir), list)
+        self.export(ROWS)
+        obs = makesvg.load_observations(self.tmpdir)
+        self.assertIsInstance(obs, ColumnFile)
+        obs.close()
+
+    def test_missing_observations(self):
+        self.assertRaises(Exception, makesvg.load_observations, self.tmpdir)
+
+
+class TestLanes(DelphikiJob):
+
+    def lanes(self, nlanes):
+        obs = makesvg.load_observations(self.tmpdir)
+        try:
+            (hosts, tasks) = group_by_host(obs)
+            return build_lanes(hosts, host_order(hosts), nlanes)
+        finally:
+            obs.close()
+
+    def test_a_lane_per_host(self):
+        self.export(ROWS)
+        (lanes, blocks) = self.lanes(2)
+        self.assertEqual(lanes, [['el7host'], ['alpha']])
+        self.assertEqual(blocks, [
+            ('setup', LEVELS, 0, 11.0, 12.0),
+            ('ping', LEVELS, 0, 14.0, 15.0),
+            ('setup', LEVELS, 1, 11.5, 13.0),
+        ])
+        # the same as drawing the rows themselves
+        (hosts, tasks) = group_by_host([x for x in ROWS if x['ts'] is not None])
+        self.assertEqual((lanes, blocks), build_lanes(hosts, host_order(hosts), 2))
+
+    def test_hosts_sharing_a_band(self):
+        self.export(ROWS)
+        (lanes, blocks) = self.lanes(1)
+        self.assertEqual(lanes, [['el7host', 'alpha']])
+        # setup covers 2.5 of the 2 hosts' 4 seconds, ping just el7host's half
+        self.assertEqual(blocks, [
+            ('setup', 5, 0, 11.0, 13.0),
+            ('ping', 4, 0, 14.0, 15.0),
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+
+import io
+import json
+import os
+import shutil
+import tempfile
+
+import unittest
+
+from ansible_dev_tools.procsampler import ProcSampler
+from ansible_dev_tools.procsampler import parse_cpu
+from ansible_dev_tools.procsampler import parse_loadavg
+from ansible_dev_tools.procsampler import parse_meminfo
+from ansible_dev_tools.procsampler import parse_netdev
+from ansible_dev_tools.procsampler import parse_pid_stat
+from ansible_dev_tools.procsampler import parse_usage
+from ansible_dev_tools.procsampler import IO_FIELDS
+
+
+STAT = '''cpu  55205 0 7407 296511 256 0 8 2127 0 0
+cpu0 55205 0 7407 296511 256 0 8 2127 0 0
+intr 342366 0 0 0 0 1 1 2
+ctxt 1368304
+btime 1792345000
+processes 15000
+procs_running 2
+procs_blocked 1
+'''
+
+MEMINFO = '''MemTotal:        6158152 kB
+MemFree:         4236332 kB
+MemAvailable:    5607616 kB
+Buffers:           64764 kB
+Cached:          1499528 kB
+SwapCached:            0 kB
+SwapTotal:             0 kB
+SwapFree:              0 kB
+SReclaimable:      55148 kB
+'''
+
+LOADAVG = '0.08 0.03 0.05 2/73 15350\n'
+
+NETDEV = '''Inter-|   Receive                                                |  Transmit
+ face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop fifo colls carrier compressed
+    lo: 95993871   10164    0    0    0     0          0         0 95993871   10164    0    0    0     0       0          0
+  eth0:  7379297     401    0    0    0     0          0         0    45946     364    0    0    0     0       0          0
+'''
+
+
+IO = '''rchar: 4000
+wchar: 2000
+syscr: 10
+syscw: 5
+read_bytes: 4096
+write_bytes: 0
+cancelled_write_bytes: 0
+'''
+
+
+def pid_stat(pid, comm, ppid, utime=0, state='S'):
+    fields = [state, ppid, pid, ppid, 0, -1, 4194304, 85, 0, 0, 0, utime, 0, 50, 25, 20, 0, 1, 0, 1000 + pid, 2703360, 313]
+    return '%s (%s) %s 0 0\n' % (pid, comm, ' '.join(str(x) for x in fields))
+
+
+def pid_status(hwm, switches):
+    return '''Name:\tbash
+State:\tS (sleeping)
+VmHWM:\t    %s kB
+VmRSS:\t     1200 kB
+voluntary_ctxt_switches:\t%s
+nonvoluntary_ctxt_switches:\t3
+''' % (hwm, switches)
+
+
+class TestParsers(unittest.TestCase):
+
+    def test_cpu(self):
+        data = parse_cpu(STAT)
+        self.assertEqual(data['cpu'], [55205, 0, 7407, 296511, 256, 0, 8, 2127])
+        self.assertEqual(data['intr'], 342366)
+        self.assertEqual(data['ctxt'], 1368304)
+        self.assertEqual(data['procs_running'], 2)
+        self.assertEqual(data['procs_blocked'], 1)
+
+    def test_meminfo(self):
+        data = parse_meminfo(MEMINFO)
+        self.assertEqual(data['MemFree'], 4236332)
+        self.assertEqual(data['SReclaimable'], 55148)
+        self.assertNotIn('SwapCached', data)
+
+    def test_loadavg(self):
+        self.assertEqual(parse_loadavg(LOADAVG), ([0.08, 0.03, 0.05], 2, 73))
+
+    def test_netdev(self):
+        self.assertEqual(parse_netdev(NETDEV), {
+            'lo': [95993871, 10164, 95993871, 10164],
+            'eth0': [7379297, 401, 45946, 364],
+        })
+
+    def test_usage(self):
+        self.assertEqual(parse_usage(IO, IO_FIELDS), {
+            'io_read_bytes': 4000,
+            'io_write_bytes': 2000,
+            'disk_read_bytes': 4096,
+            'disk_write_bytes': 0,
+        })
+
+    def test_pid_stat_odd_comm(self):
+        raw = pid_stat(12, 'a) (b', 1).encode('utf-8')
+        (comm, fields) = parse_pid_stat(raw)
+        self.assertEqual(comm, 'a) (b')
+        self.assertEqual(fields[1], b'1')
+
+
+class TestProcSampler(unittest.TestCase):
+
+    def setUp(self):
+        self.proc = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.proc, 'net'))
+        for (name, data) in (('stat', STAT), ('meminfo', MEMINFO), ('loadavg', LOADAVG), ('net/dev', NETDEV)):
+            self.write(name, data)
+        # 100 is the root, 101 and it's child 102 are under it, 200 is not
+        self.add_pid(1, 'init', 0)
+        self.add_pid(100, 'bash', 1)
+        self.add_pid(101, 'ansible-playbook', 100)
+        self.add_pid(102, 'ssh', 101)
+        self.add_pid(200, 'sshd', 1)
+
+    def tearDown(self):
+        shutil.rmtree(self.proc)
+
+    def write(self, name, data):
+        with open(os.path.join(self.proc, name), 'w') as f:
+            f.write(data)
+
+    def add_pid(self, pid, comm, ppid, utime=0, hwm=2000, switches=7):
+        piddir = os.path.join(self.proc, str(pid))
+        if not os.path.isdir(piddir):
+            os.makedirs(piddir)
+        self.write('%s/stat' % pid, pid_stat(pid, comm, ppid, utime=utime))
+        self.write('%s/cmdline' % pid, '%s\0--arg\0' % comm)
+        self.write('%s/status' % pid, pid_status(hwm, switches))
+        self.write('%s/io' % pid, IO)
+
+    def test_samples(self):
+        f = io.StringIO()
+        sampler = ProcSampler(f, root=100, proc=self.proc)
+        sampler.header()
+        sampler.sample()
+        self.add_pid(101, 'ansible-playbook', 100, utime=25, hwm=9000, switches=40)
+        sampler.sample()
+        shutil.rmtree(os.path.join(self.proc, '102'))
+        self.add_pid(103, 'ssh', 101)
+        sampler.sample()
+        # the peak can only go up, even when status stops showing memory
+        self.add_pid(101, 'ansible-playbook', 100, utime=30, hwm=0, switches=41)
+        sampler.sample()
+        sampler.finish_pids()
+        sampler.footer()
+        sampler.close()
+
+        records = [json.loads(x) for x in f.getvalue().splitlines()]
+        self.assertEqual(
+            [x['kind'] for x in records],
+            ['header', 'sample', 'sample', 'sample', 'pid', 'sample', 'pid', 'pid', 'pid', 'footer']
+        )
+        (first, second, third) = records[1:4]
+
+        self.assertEqual(sorted(first['pids']), ['100', '101', '102'])
+        self.assertEqual(first['new']['101'], 'ansible-playbook --arg')
+        self.assertEqual(first['pids']['102'], [101, 'S', 0, 0, 313, 'ssh'])
+        self.assertEqual(first['mem']['MemTotal'], 6158152)
+        self.assertEqual(first['net']['eth0'][0], 7379297)
+        self.assertEqual(first['load'], [0.08, 0.03, 0.05])
+        self.assertEqual(first['tasks'], 73)
+
+        # only what moved is written again
+        self.assertEqual(list(second['pids']), ['101'])
+        self.assertEqual(second['pids']['101'][2], 25)
+        self.assertEqual(second['new'], {})
+
+        self.assertEqual(third['gone'], [102])
+        self.assertEqual(list(third['pids']), ['103'])
+        self.assertGreaterEqual(third['ts'], second['ts'])
+        self.assertEqual(records[-1]['samples'], 4)
+
+        exited = records[4]
+        self.assertEqual(exited['pid'], 102)
+        self.assertEqual(exited['ppid'], 101)
+        self.assertTrue(exited['exited'])
+        self.assertEqual(exited['cmd'], 'ssh --arg')
+        self.assertEqual(exited['start'], 1792345000 + 11.02)
+        self.assertEqual(exited['seen'], second['ts'])
+        self.assertEqual(exited['children_utime'], 0.5)
+        self.assertEqual(exited['voluntary_ctxt_switches'], 7)
+        self.assertEqual(exited['io_read_bytes'], 4000)
+
+        running = dict((x['pid'], x) for x in records[6:9])
+        self.assertEqual(sorted(running), [100, 101, 103])
+        self.assertFalse(running[101]['exited'])
+        self.assertEqual(running[101]['utime'], 0.3)
+        self.assertEqual(running[101]['peak_rss_kb'], 9000)
+        self.assertEqual(running[101]['voluntary_ctxt_switches'], 41)
+
+    def test_all_pids(self):
+        f = io.StringIO()
+        sampler = ProcSampler(f, proc=self.proc)
+        sampler.sample()
+        sampler.close()
+        record = json.loads(f.getvalue())
+        self.assertEqual(sorted(record['pids']), ['1', '100', '101', '102', '200'])
+
+
+if __name__ == '__main__':
+    unittest.main()
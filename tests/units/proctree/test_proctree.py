@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+
+import io
+import json
+import pickle
+import time
+
+import unittest
+
+from collections import OrderedDict
+
+from ansible_dev_tools.proctree import ProcessTree
+
+
+class TestProcessTree(unittest.TestCase):
+
+    def setUp(self):
+        self.tree = ProcessTree()
+        self.tree.add_root(1)
+        self.tree.add_child(1, 2)
+        self.tree.add_child(1, 3)
+        self.tree.add_child(2, 4)
+
+    def test_maps(self):
+        self.assertIn(4, self.tree)
+        self.assertNotIn(5, self.tree)
+        self.assertEqual(self.tree.parent(4), 2)
+        self.assertIsNone(self.tree.parent(1))
+        self.assertEqual(self.tree.children(1), [2, 3])
+        self.assertTrue(self.tree.is_root(1))
+        self.assertEqual(list(self.tree.walk()), [1, 2, 4, 3])
+
+    def test_adding_twice_keeps_the_node(self):
+        node = self.tree.node(2)
+        self.tree.add_child(1, 2)
+        self.assertIs(self.tree.node(2), node)
+        self.assertEqual(self.tree.children(2), [4])
+
+    def test_exports(self):
+        expected = {1: {2: {4: {}}, 3: {}}}
+        self.assertEqual(self.tree.to_dict(), expected)
+        self.assertEqual(
+            json.loads(self.tree.to_json()),
+            {'1': {'2': {'4': {}}, '3': {}}}
+        )
+        f = io.BytesIO()
+        self.tree.dump_pickle(f)
+        self.assertEqual(pickle.loads(f.getvalue()), expected)
+
+    def test_labeled_asciitree(self):
+        rendered = self.tree.to_asciitree(labels=lambda pid: ['host: h%s' % pid] if pid == 2 else [])
+        self.assertEqual(rendered.splitlines(), [
+            '1',
+            ' +-- 2',
+            ' |   +-- host: h2',
+            ' |   +-- 4',
+            ' +-- 3',
+        ])
+        # labelling works on a copy
+        self.assertEqual(self.tree.children(2), [4])
+
+    def test_from_dict(self):
+        tree = ProcessTree.from_dict(OrderedDict([(1, OrderedDict([(2, OrderedDict([(4, OrderedDict())]))]))]))
+        self.assertEqual(tree.parent(4), 2)
+        self.assertIs(tree.node(4), tree.to_dict()[1][2][4])
+
+    def test_linear_build(self):
+        tree = ProcessTree()
+        tree.add_root(0)
+        t0 = time.time()
+        for pid in range(1, 100000):
+            tree.add_child(pid // 10, pid)
+        self.assertLess(time.time() - t0, 5)
+        self.assertEqual(len(tree), 100000)
+        self.assertEqual(tree.parent(99999), 9999)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import tempfile
+import time
+
+import unittest
+
+from ansible_dev_tools.pyprofile import StackSampler
+from ansible_dev_tools.pyprofile import fold
+from ansible_dev_tools.pyprofile import frame_label
+from ansible_dev_tools.pyprofile import install
+from ansible_dev_tools.pyprofile import list_profiles
+from ansible_dev_tools.pyprofile import read_stacks
+from ansible_dev_tools.pyprofile import write_folded
+
+
+STACKS = '''s 0 ansible-playbook:<module>;ansible/cli/playbook.py:run
+1542665612.5000 0
+s 1 ansible-playbook:<module>;ansible/plugins/strategy/linear.py:run
+1542665612.5100 1
+1542665612.5200 0
+1542665612.53
+'''
+
+
+class FakeCode(object):
+    def __init__(self, filename, name):
+        self.co_filename = filename
+        self.co_name = name
+
+
+class TestReading(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_frame_label(self):
+        code = FakeCode('/usr/lib/python3/site-packages/ansible/executor/task_executor.py', '_execute')
+        self.assertEqual(frame_label(code), 'ansible/executor/task_executor.py:_execute')
+        code = FakeCode('/usr/lib64/python3.11/subprocess.py', 'wait')
+        self.assertEqual(frame_label(code), 'subprocess.py:wait')
+
+    def test_read_stacks(self):
+        fn = os.path.join(self.tmpdir, '5000.stacks')
+        with open(fn, 'w') as f:
+            f.write(STACKS)
+        samples = read_stacks(fn)
+        # the last line was cut short by a kill
+        self.assertEqual(len(samples), 3)
+        self.assertEqual(samples[1], (1542665612.51, 'ansible-playbook:<module>;ansible/plugins/strategy/linear.py:run'))
+
+    def test_list_profiles(self):
+        for fn in ('5000.stacks', '5001.stacks', '5000.pstats', 'notes.stacks'):
+            open(os.path.join(self.tmpdir, fn), 'w').close()
+        stacks = list_profiles(self.tmpdir, '.stacks')
+        self.assertEqual(sorted(stacks), [5000, 5001])
+        self.assertEqual(list_profiles(os.path.join(self.tmpdir, 'missing'), '.stacks'), {})
+
+    def test_fold(self):
+        folded = fold([('task; one', 'a;b'), ('task; one', 'a;b'), ('task two', 'a'), ('idle', '')])
+        self.assertEqual(folded['task, one;a;b'], 2)
+        self.assertEqual(folded['task two;a'], 1)
+        self.assertEqual(folded['idle'], 1)
+
+        dest = os.path.join(self.tmpdir, 'out.folded')
+        write_folded(folded, dest)
+        with open(dest) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines, ['idle 1', 'task two;a 1', 'task, one;a;b 2'])
+
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_install_only_profiles_ansible_playbook(self):
+        environ = {'JULIAN_PYPROFILE': 'sample', 'JULIAN_PYPROFILE_DIR': self.tmpdir}
+        self.assertIsNone(install(environ=environ))
+        self.assertIsNone(install(environ={}))
+        self.assertEqual(os.listdir(self.tmpdir), [])
+
+    def test_stack_sampler(self):
+        sampler = StackSampler(self.tmpdir, interval=0.005)
+        sampler.start()
+        try:
+            started = time.process_time()
+            while time.process_time() - started < 0.2:
+                sum(range(1000))
+        finally:
+            sampler.stop()
+        samples = read_stacks(os.path.join(self.tmpdir, '%s.stacks' % os.getpid()))
+        self.assertTrue(samples)
+        self.assertTrue(any('test_pyprofile.py:test_stack_sampler' in x[1] for x in samples))
+        # nothing is written once it stopped
+        sampler.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
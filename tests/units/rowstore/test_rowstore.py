@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+
+import unittest
+
+from ansible_dev_tools.rowstore import RowStore
+
+
+class TestRowStore(unittest.TestCase):
+
+    rows = [
+        {'pid': 10, 'ts': 1.5, 'line': 'a', 'file': 'stdout.log', 'linenum': 1},
+        {'hostname': 'h1', 'play': '[all]', 'task': 't1', 'ts': 2.0, 'pid': 10, 'line': ' b '},
+        {'host': 'h2', 'port': '22', 'cp': True, 'ts': None, 'line': 'c', 'task': 't1'},
+        {'date': '2018-10-12', 'ppid': 5, 'pid': 11, 'ts': 1.0, 'host': 'h1', 'task': 't2', 'odd': [1, 2]},
+    ]
+
+    def setUp(self):
+        self.store = RowStore.from_rows(dict(x) for x in self.rows)
+
+    def test_rows_load_back_unchanged(self):
+        self.assertEqual(len(self.store), 4)
+        self.assertEqual(list(self.store), self.rows)
+        self.assertEqual([list(x.keys()) for x in self.store], [list(x.keys()) for x in self.rows])
+        self.assertEqual(self.store[-1], self.rows[-1])
+
+    def test_where_and_take(self):
+        self.assertEqual(self.store.where('task', 't1'), [1, 2])
+        self.assertEqual(self.store.where('task', 'nope'), [])
+        self.assertEqual(self.store.where('pid', 10), [0, 1])
+        subset = self.store.take([3, 0])
+        self.assertEqual(list(subset), [self.rows[3], self.rows[0]])
+
+    def test_set_and_pop(self):
+        self.store.set(1, 'host', 'h1')
+        self.assertEqual(self.store.pop(1, 'hostname'), 'h1')
+        row = self.store[1]
+        self.assertEqual(list(row.keys()), ['play', 'task', 'ts', 'pid', 'line', 'host'])
+        self.assertEqual(self.store.with_key('hostname'), [])
+
+    def test_order_by_ts(self):
+        # rows without a timestamp sort first
+        self.assertEqual(self.store.order_by_ts(), [2, 3, 0, 1])
+
+    def test_extend_recodes(self):
+        other = RowStore.from_rows([{'task': 't3', 'ts': 9.0}, {'task': 't1'}])
+        self.store.extend(other)
+        self.assertEqual(self.store.where('task', 't1'), [1, 2, 5])
+        self.assertEqual(self.store[4], {'task': 't3', 'ts': 9.0})
+
+    def test_add_keys(self):
+        self.store.set_float_column('rts', [0.0, 1.0, 2.0, 3.0])
+        self.store.add_keys(('rts',))
+        self.assertEqual([x['rts'] for x in self.store], [0.0, 1.0, 2.0, 3.0])
+        self.assertEqual(list(self.store[0].keys())[-1], 'rts')
+
+    def test_chunked_appends(self):
+        from ansible_dev_tools import rowstore
+        chunk = rowstore.CHUNK_ROWS
+        rowstore.CHUNK_ROWS = 3
+        try:
+            rows = [dict(x, linenum=idx) for (idx, x) in enumerate(self.rows * 3)]
+            store = RowStore.from_rows(dict(x) for x in rows)
+        finally:
+            rowstore.CHUNK_ROWS = chunk
+        self.assertEqual(list(store), rows)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+
+import unittest
+
+from ansible_dev_tools.rowwriters import format_ts
+from ansible_dev_tools.rowwriters import part_path
+from ansible_dev_tools.rowwriters import partition_path
+from ansible_dev_tools.rowwriters import read_columnar_rows
+from ansible_dev_tools.rowwriters import split_dest
+from ansible_dev_tools.rowwriters import write_rows
+
+
+ROWS = [
+    {'ts': 1.5, 'pid': 10, 'host': 'h1', 'task': 't1', 'line': ' a \n'},
+    {'ts': 2.25, 'pid': 11, 'host': 'h2', 'task': 't1', 'play': 'p', 'line': 'b\n'},
+    {'ts': 3.0, 'pid': 10, 'host': 'h1', 'task': 't2', 'port': '22', 'line': 'c\n'},
+]
+
+
+class TestRowWriters(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def path(self, name):
+        return os.path.join(self.tmpdir, name)
+
+    def test_split_dest(self):
+        self.assertEqual(split_dest('/x/out.csv.gz'), ('/x/out', 'csv', 'gz'))
+        self.assertEqual(split_dest('out.ndjson'), ('out', 'ndjson', None))
+        self.assertEqual(split_dest('out.txt')[1], None)
+        self.assertEqual(partition_path('/x/out.csv.gz', 'web/1'), '/x/out.web_1.csv.gz')
+
+    def test_format_ts(self):
+        self.assertEqual(format_ts(1.5), '1.50000')
+        self.assertEqual(format_ts(1542665764.631629), '1542665764.631629')
+        self.assertEqual(format_ts('1542665764'), '1542665764.00000')
+        self.assertEqual(format_ts(None), '')
+
+    def test_json_in_batches(self):
+        write_rows(self.path('out.json'), ROWS, batch_rows=2)
+        with open(self.path('out.json')) as f:
+            data = f.read()
+        self.assertEqual(data, json.dumps(ROWS))
+
+    def test_csv_columns_from_first_batch(self):
+        write_rows(self.path('out.csv.gz'), ROWS, batch_rows=2)
+        with gzip.open(self.path('out.csv.gz'), 'rt') as f:
+            lines = list(csv.reader(f))
+        self.assertEqual(lines[0], ['ts', 'pid', 'play', 'task', 'host', 'line'])
+        self.assertEqual(lines[1], ['1.50000', '10', '', 't1', 'h1', 'a'])
+        self.assertEqual(len(lines), 4)
+
+    def test_csv_with_keys(self):
+        keys = set()
+        for row in ROWS:
+            keys.update(row)
+        write_rows(self.path('out.csv'), ROWS, keys=keys)
+        with open(self.path('out.csv')) as f:
+            lines = list(csv.reader(f))
+        self.assertEqual(lines[0], ['ts', 'pid', 'play', 'task', 'host', 'port', 'line'])
+        self.assertEqual(lines[3][5], '22')
+
+    def test_ndjson_and_columnar(self):
+        write_rows(self.path('out.ndjson'), ROWS)
+        with open(self.path('out.ndjson')) as f:
+            self.assertEqual([json.loads(x) for x in f], ROWS)
+        write_rows(self.path('out.adtc'), ROWS, batch_rows=2)
+        self.assertEqual(list(read_columnar_rows(self.path('out.adtc'))), ROWS)
+
+    def test_partitions(self):
+        write_rows(self.path('out.jsonl'), ROWS, partition_by='host')
+        with open(self.path('out.h1.jsonl')) as f:
+            self.assertEqual([json.loads(x) for x in f], [ROWS[0], ROWS[2]])
+        self.assertTrue(os.path.exists(self.path('out.h2.jsonl')))
+
+    def many_partitions(self):
+        # 10 hosts written round robin through 3 open files
+        return [
+            {'ts': float(idx), 'pid': idx, 'host': 'h%s' % (idx % 10), 'line': 'l%s\n' % idx}
+            for idx in range(50)
+        ]
+
+    def test_partitions_over_the_open_cap_append(self):
+        rows = self.many_partitions()
+        write_rows(self.path('out.csv.gz'), rows, partition_by='host', batch_rows=2, max_open=3)
+        for host in range(10):
+            with gzip.open(self.path('out.h%s.csv.gz' % host), 'rt') as f:
+                lines = list(csv.reader(f))
+            # one header, even though the file was reopened four times
+            self.assertEqual(lines[0], ['ts', 'pid', 'play', 'task', 'host', 'line'])
+            self.assertEqual([x[1] for x in lines[1:]], [str(x) for x in range(host, 50, 10)])
+
+        write_rows(self.path('out.ndjson'), rows, partition_by='host', max_open=3)
+        with open(self.path('out.h3.ndjson')) as f:
+            self.assertEqual([json.loads(x) for x in f], rows[3::10])
+
+    def test_partitions_over_the_open_cap_split_into_parts(self):
+        rows = self.many_partitions()
+        write_rows(self.path('out.json'), rows, partition_by='host', max_open=3)
+        path = self.path('out.h3.json')
+        self.assertEqual(part_path(path, 1), self.path('out.h3.part1.json'))
+        found = []
+        for fn in [path] + [part_path(path, x) for x in range(1, 5)]:
+            with open(fn) as f:
+                found += json.loads(f.read())
+        self.assertEqual(found, rows[3::10])
+        self.assertFalse(os.path.exists(part_path(path, 5)))
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+import gzip
+import os
+import shutil
+import tempfile
+
+import unittest
+
+from ansible_dev_tools.sosreport import get_sos_logs
+from ansible_dev_tools.sosreport import load_sos_reports
+from ansible_dev_tools.sosreport import TimestampCache
+
+
+class TestSosReport(unittest.TestCase):
+
+    def setUp(self):
+        self.sosdir = tempfile.mkdtemp()
+        for sub in ['sos_commands/general', 'var/log/audit']:
+            os.makedirs(os.path.join(self.sosdir, sub))
+        self.write('hostname', 'node1\n')
+        self.write('sos_commands/general/date', 'Tue Nov 27 10:33:12 EST 2018\n')
+        self.write('var/log/messages', (
+            'Nov 27 10:00:02 node1 sshd[2]: second\n'
+            'not a syslog line\n'
+            'Nov 27 10:00:05 node1 sshd[3]: fourth\n'
+        ))
+        with gzip.open(os.path.join(self.sosdir, 'var/log/messages-20181126.gz'), 'wt') as f:
+            f.write('Nov 26 23:59:59 node1 sshd[1]: first\n')
+        self.write('var/log/audit/audit.log', (
+            'type=USER_ACCT msg=audit(1543330803.250:10): pid=4 uid=0\n'
+        ))
+
+    def tearDown(self):
+        shutil.rmtree(self.sosdir)
+
+    def write(self, path, data):
+        with open(os.path.join(self.sosdir, path), 'w') as f:
+            f.write(data)
+
+    def test_logs_are_merged_in_time_order(self):
+        (hostname, logs) = get_sos_logs(self.sosdir)
+        self.assertEqual(hostname, 'node1')
+        # audit times depend on the local timezone, like sos' own date
+        self.assertEqual(
+            [x[2].split()[-1] for x in logs if not x[1].startswith('audit')],
+            ['first', 'second', 'fourth']
+        )
+        self.assertEqual(sorted(x[0] for x in logs), [x[0] for x in logs])
+        self.assertEqual(logs[0][1], 'messages-20181126.gz:0')
+        self.assertEqual(str(logs[0][0]), '2018-11-26 23:59:59-05:00')
+        self.assertIn('audit.log:0', [x[1] for x in logs])
+
+    def test_load_sos_reports(self):
+        soshosts = load_sos_reports([self.sosdir])
+        self.assertEqual(list(soshosts.keys()), ['node1'])
+        self.assertEqual(len(soshosts['node1']), 4)
+
+
+class TestTimestampCache(unittest.TestCase):
+
+    def test_repeated_timestamps_are_parsed_once(self):
+        tscache = TimestampCache('EST')
+        a = tscache.strptime('2018 Nov 27 10:00:02', '%Y %b %d %H:%M:%S')
+        b = tscache.strptime('2018 Nov 27 10:00:02', '%Y %b %d %H:%M:%S')
+        self.assertIs(a, b)
+        self.assertIsNone(tscache.strptime('2018 not a date', '%Y %b %d %H:%M:%S'))
+
+    def test_fromtimestamp_keeps_fractions(self):
+        tscache = TimestampCache('EST')
+        a = tscache.fromtimestamp('1543330803.250')
+        b = tscache.fromtimestamp('1543330803.000')
+        self.assertEqual(a.microsecond, 250000)
+        self.assertEqual((a - b).total_seconds(), 0.25)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import tempfile
+
+import unittest
+
+from ansible_dev_tools.stracelog import load_strace_files
+from ansible_dev_tools.stracelog import parse_strace_line
+from ansible_dev_tools.stracelog import process_rows
+from ansible_dev_tools.stracelog import read_strace_file
+
+
+SSH_EXECVE = (
+    '1542665612.100000 execve("/usr/bin/ssh", ["ssh", "-C", "-o", "User=root", '
+    '"root@el7host", "/bin/sh -c \'echo ~\'"], 0x7ffd [/* 20 vars */]) = 0 <0.000300>\n'
+)
+CLONE = '1542665612.200000 clone(child_stack=NULL, flags=SIGCHLD, child_tidptr=0x7f) = 6001 <0.000200>\n'
+READ = '1542665612.300000 read(3, "clone(x) = 1, [\\"a\\"],", 4096) = 22 <0.000010>\n'
+EXITED = '1542665612.400000 +++ exited with 0 +++\n'
+
+
+class TestParseStraceLine(unittest.TestCase):
+
+    def test_execve(self):
+        row = parse_strace_line('strace.5000', 3, SSH_EXECVE)
+        self.assertEqual(row['pid'], 5000)
+        self.assertEqual(row['ts'], 1542665612.1)
+        self.assertEqual(row['syscall'], 'execve')
+        self.assertEqual(row['args'][0], 'ssh')
+        self.assertEqual(row['host'], 'el7host')
+        self.assertEqual(row['duration'], '0.000300')
+
+    def test_clone(self):
+        row = parse_strace_line('strace.5000', 1, CLONE)
+        self.assertEqual(row['clones'], [6001])
+        self.assertEqual(row['args'], [])
+
+    def test_clone3_and_vfork(self):
+        line = '1542665612.2 clone3({flags=CLONE_VM|CLONE_VFORK, exit_signal=SIGCHLD}, 88) = 6002 <0.0002>'
+        self.assertEqual(parse_strace_line('strace.5000', 1, line)['clones'], [6002])
+        line = '1542665612.2 vfork() = 6003 <0.0002>'
+        self.assertEqual(parse_strace_line('strace.5000', 1, line)['clones'], [6003])
+
+    def test_failed_clone(self):
+        line = '1542665612.2 clone(child_stack=NULL, flags=CLONE_VM) = -1 EAGAIN (Resource) <0.00001>'
+        self.assertEqual(parse_strace_line('strace.5000', 1, line)['clones'], [None])
+
+    def test_other_syscalls_skip_argv(self):
+        row = parse_strace_line('strace.5000', 2, READ)
+        self.assertEqual(row['syscall'], 'read')
+        self.assertEqual(row['args'], [])
+        self.assertEqual(row['clones'], [])
+
+    def test_signals(self):
+        row = parse_strace_line('strace.5000', 2, '1549310198.245188 --- SIGCHLD {si_signo=SIGCHLD} ---')
+        self.assertEqual(row['syscall'], 'SIGCHLD')
+        self.assertIsNone(row['duration'])
+        self.assertIsNone(parse_strace_line('strace.5000', 2, 'garbage'))
+
+
+class TestReadStraceFile(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'strace.5000')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, lines):
+        with open(self.filename, 'w') as f:
+            f.write(''.join(lines))
+
+    def test_keeps_first_last_execve_and_clone(self):
+        lines = [READ] * 3 + [SSH_EXECVE] + [READ] * 50 + [CLONE, '\n'] + [READ] * 50 + [EXITED]
+        self.write(lines)
+        for blocksize in (16, 100, 1024 * 1024):
+            rows = read_strace_file(self.filename, blocksize=blocksize)
+            self.assertEqual([x['linenumber'] for x in rows], [0, 3, 54, 106])
+            self.assertEqual([x['syscall'] for x in rows], ['read', 'execve', 'clone', None])
+
+    def test_single_line(self):
+        self.write([CLONE.rstrip('\n')])
+        rows = read_strace_file(self.filename)
+        self.assertEqual([x['linenumber'] for x in rows], [0])
+
+    def test_empty(self):
+        self.write([])
+        self.assertEqual(read_strace_file(self.filename), [])
+
+    def test_load_in_processes(self):
+        filenames = []
+        for pid in range(5000, 5010):
+            filename = os.path.join(self.tmpdir, 'strace.%s' % pid)
+            with open(filename, 'w') as f:
+                f.write(''.join([READ, CLONE, READ, EXITED]))
+            filenames.append(filename)
+        serial = list(load_strace_files(filenames))
+        self.assertEqual([x[0] for x in serial], filenames)
+        self.assertEqual(serial[-1][1][0]['pid'], 5009)
+        self.assertEqual(list(load_strace_files(filenames, jobs=2)), serial)
+
+
+class TestProcessRows(unittest.TestCase):
+
+    def record(self, pid, ppid, start, argv):
+        return {'pid': pid, 'ppid': ppid, 'start': start, 'seen': start + 1, 'argv': argv}
+
+    def test_tree_from_pid_records(self):
+        playbook = ['/usr/bin/python3', '/usr/bin/ansible-playbook', 'site.yml']
+        records = [
+            self.record(6001, 6000, 3.0, ['ssh', '-C', 'root@el7host', '/bin/sh -c echo']),
+            self.record(5000, 100, 1.0, playbook),
+            # forked, never exec'd
+            self.record(6000, 5000, 2.0, playbook),
+            self.record(100, 1, 0.0, ['bash', 'julian']),
+            self.record(7000, 100, 2.5, ['tee', 'stdout.log']),
+        ]
+        rows = process_rows(records, 'procsamples.ndjson')
+
+        self.assertTrue(all(x['strace'] for x in rows))
+        self.assertNotIn(100, [x['pid'] for x in rows])
+        self.assertNotIn(7000, [x['pid'] for x in rows])
+
+        clones = [(x['pid'], x['clones']) for x in rows if x['clones']]
+        self.assertEqual(clones, [(5000, [6000]), (6000, [6001])])
+
+        execs = dict((x['pid'], x) for x in rows if x['syscall'] == 'execve')
+        self.assertEqual(sorted(execs), [5000, 6001])
+        self.assertEqual(execs[5000]['args'][0], '/usr/bin/ansible-playbook')
+        self.assertEqual(execs[6001]['host'], 'el7host')
+        self.assertEqual(max(x['ts'] for x in rows if x['pid'] == 6001), 4.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+
+import json
+import os
+import shutil
+import tempfile
+
+import unittest
+
+from ansible_dev_tools.sysmetrics import read_pid_usage
+from ansible_dev_tools.sysmetrics import read_samples
+from ansible_dev_tools.sysmetrics import read_top
+from ansible_dev_tools.sysmetrics import read_vmstat
+from ansible_dev_tools.sysmetrics import vmstat_start
+
+
+VMSTAT = '''procs -----------memory---------- ---swap-- -----io---- -system-- ------cpu----- -----timestamp-----
+ r  b   swpd   free   buff  cache   si   so    bi    bo   in   cs us sy id wa st                 %s
+ 2  0  43836 1524804  31152 278956  148   75   154    83   21    8  0  0 98  2  0 2019-02-11 16:13:04
+ 1  0  43836 1524000  31152 278956    0    0     0     0   50   60  4  2 94  0  0 2019-02-11 16:13:05
+ 3  0  43836 1523000  31152 278956    0    0     0     0   70   80  8  4 88  0  0 2019-02-11 16:13:06
+'''
+
+TOP = '''top - %s up 17 days, 21:39,  1 user,  load average: 0.08, 0.03, 0.05
+Tasks:  84 total,   2 running,  77 sleeping,   2 stopped,   3 zombie
+%%Cpu(s):  0.0 us,  0.0 sy,  0.0 ni,100.0 id,  0.0 wa,  0.0 hi,  0.0 si,  0.0 st
+KiB Mem :  1882220 total,  1513532 free,    56916 used,   311772 buff/cache
+KiB Swap:        0 total,        0 free,        0 used.  1661132 avail Mem
+
+  PID USER      PR  NI    VIRT    RES    SHR S  %%CPU %%MEM     TIME+ COMMAND
+    1 root      20   0  128000   6700   4100 S   0.0  0.4   0:01.23 systemd
+'''
+
+# 2019-02-11 16:13:04 UTC
+START = 1549901584.0
+
+
+class TestSysMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, data):
+        fn = os.path.join(self.tmpdir, name)
+        with open(fn, 'w') as f:
+            f.write(data)
+        return fn
+
+    def test_vmstat(self):
+        fn = self.write('vmstat.log', VMSTAT % 'UTC')
+        series = read_vmstat(fn)
+        self.assertEqual(series.timezone, 'UTC')
+        self.assertEqual(list(series.ts), [START, START + 1, START + 2])
+        self.assertEqual(list(series.linenumbers), [2, 3, 4])
+        rows = list(series.rows(prefix='vmstat_'))
+        self.assertEqual(rows[0]['vmstat_r'], 2)
+        self.assertEqual(rows[0]['vmstat_free'], 1524804)
+        self.assertEqual(rows[2]['vmstat_id'], 88)
+        self.assertEqual(list(rows[0].keys())[-1], 'ts')
+        self.assertEqual(vmstat_start(fn), (START, 'UTC'))
+
+    def test_vmstat_timezone(self):
+        # five hours behind utc in february, not the zone's LMT offset
+        fn = self.write('vmstat.log', VMSTAT % 'America/New_York')
+        series = read_vmstat(fn)
+        self.assertEqual(series.ts[0], START + 5 * 3600)
+
+    def test_top_anchored(self):
+        fn = self.write('top.log', TOP % '16:13:04' + TOP % '16:13:07')
+        series = read_top(fn, anchor=START, timezone='UTC')
+        self.assertEqual(list(series.ts), [START, START + 3])
+        self.assertEqual(list(series.linenumbers), [0, 8])
+        row = next(series.rows())
+        self.assertEqual(row['users'], 1)
+        self.assertEqual(row['load_15'], 0.05)
+        self.assertEqual(row['zombie'], 3)
+        self.assertEqual(row['kib_mem_free'], 1513532)
+        self.assertEqual(row['kib_mem_buff/cache'], 311772)
+
+    def test_top_midnight(self):
+        fn = self.write('top.log', TOP % '23:59:59' + TOP % '00:00:02')
+        series = read_top(fn, anchor=START, timezone='UTC')
+        midnight = START + (24 - 16) * 3600 - 13 * 60 - 4
+        self.assertEqual(list(series.ts), [midnight - 1, midnight + 2])
+
+    def test_top_starts_after_midnight(self):
+        # the run started late in the day and top's first sample is the next
+        fn = self.write('top.log', TOP % '00:00:02')
+        series = read_top(fn, anchor=START + 7 * 3600 + 46 * 60, timezone='UTC')
+        midnight = START + (24 - 16) * 3600 - 13 * 60 - 4
+        self.assertEqual(list(series.ts), [midnight + 2])
+
+    def test_top_partial_sample(self):
+        fn = self.write('top.log', 'top - 16:13:04 up 1 day,  1 user,  load average: 0.1, 0.2, 0.3\n')
+        row = next(read_top(fn, anchor=START, timezone='UTC').rows())
+        self.assertEqual(row['load_1'], 0.1)
+        self.assertIsNone(row['tasks'])
+        self.assertIsNone(row['kib_mem_free'])
+
+    def test_downsample_and_rolling(self):
+        fn = self.write('vmstat.log', VMSTAT % 'UTC')
+        series = read_vmstat(fn)
+
+        halves = series.downsample(2)
+        self.assertEqual(list(halves.ts), [START, START + 2])
+        self.assertEqual(list(halves.columns['us']), [2.0, 8.0])
+        self.assertEqual(list(halves.linenumbers), [2, 4])
+        self.assertEqual(list(series.downsample(2, how='max').columns['r']), [2.0, 3.0])
+
+        self.assertEqual(list(series.rolling('cs', 2)), [8.0, 34.0, 70.0])
+
+    def test_procsampler_capture(self):
+        mem = {
+            'MemTotal': 1000, 'MemFree': 400, 'MemAvailable': 700, 'Buffers': 50,
+            'Cached': 200, 'SReclaimable': 50, 'SwapTotal': 100, 'SwapFree': 60,
+        }
+        records = [
+            {'kind': 'header', 'timezone': 'UTC'},
+            {'kind': 'sample', 'ts': START, 'mono': 10.0, 'cpu': [0, 0, 0, 0, 0, 0, 0, 0],
+             'intr': 1000, 'ctxt': 5000, 'procs_running': 1, 'procs_blocked': 0,
+             'load': [0.5, 0.25, 0.1], 'tasks': 80, 'mem': mem},
+            {'kind': 'sample', 'ts': START + 0.5, 'mono': 10.5, 'cpu': [30, 10, 20, 30, 10, 0, 0, 0],
+             'intr': 1100, 'ctxt': 5400, 'procs_running': 3, 'procs_blocked': 1,
+             'load': [0.75, 0.25, 0.1], 'tasks': 82, 'mem': mem},
+            {'kind': 'footer'},
+        ]
+        fn = self.write('procsamples.ndjson', ''.join(json.dumps(x) + '\n' for x in records) + '{"kind": "sam')
+        (vmstat, top) = read_samples(fn)
+
+        self.assertEqual(len(top), 2)
+        row = next(top.rows())
+        self.assertEqual(row['load_1'], 0.5)
+        self.assertEqual(row['tasks'], 80)
+        self.assertEqual(row['kib_mem_used'], 300)
+        self.assertEqual(row['kib_mem_buff/cache'], 300)
+        self.assertIsNone(row['users'])
+
+        # the first sample only serves as the base for the rates
+        self.assertEqual(list(vmstat.ts), [START + 0.5])
+        self.assertEqual(list(vmstat.linenumbers), [2])
+        row = next(vmstat.rows(prefix='vmstat_'))
+        self.assertEqual((row['vmstat_r'], row['vmstat_b']), (3, 1))
+        self.assertEqual(row['vmstat_swpd'], 40)
+        self.assertEqual(row['vmstat_cache'], 250)
+        self.assertEqual((row['vmstat_in'], row['vmstat_cs']), (200, 800))
+        self.assertEqual([row['vmstat_' + x] for x in ('us', 'sy', 'id', 'wa', 'st')], [40, 20, 30, 10, 0])
+        self.assertIsNone(row['vmstat_bi'])
+
+    def test_pid_usage(self):
+        records = [
+            {'kind': 'header'},
+            {'kind': 'sample', 'ts': START},
+            {'kind': 'pid', 'pid': 10, 'utime': 1.5, 'stime': 0.5, 'peak_rss_kb': 9000},
+            {'kind': 'pid', 'pid': 11, 'utime': 0.1, 'stime': 0.0},
+            # pid 10 reused by something that did less
+            {'kind': 'pid', 'pid': 10, 'utime': 0.0, 'stime': 0.1},
+            {'kind': 'footer'},
+        ]
+        lines = [json.dumps(x, separators=(',', ':')) + '\n' for x in records]
+        fn = self.write('procsamples.ndjson', ''.join(lines))
+        usage = read_pid_usage(fn)
+        self.assertEqual(sorted(usage), [10, 11])
+        self.assertEqual(usage[10]['peak_rss_kb'], 9000)
+        self.assertNotIn('kind', usage[11])
+
+
+if __name__ == '__main__':
+    unittest.main()
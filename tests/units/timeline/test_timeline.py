@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+
+import random
+
+import unittest
+
+from ansible_dev_tools.timeline import Timeline
+from ansible_dev_tools.timeline import concurrency_curve
+
+
+class TestTimeline(unittest.TestCase):
+
+    def setUp(self):
+        self.timeline = Timeline(0.0, 10.0, 10)
+
+    def test_bins(self):
+        bins = self.timeline.bins()
+        self.assertEqual(len(bins), 10)
+        self.assertEqual(bins[0], (0.0, 1.0))
+        self.assertEqual(bins[-1][1], 10.0)
+        self.assertEqual(self.timeline.bin_index(0.0), 0)
+        self.assertEqual(self.timeline.bin_index(2.5), 2)
+        self.assertIsNone(self.timeline.bin_index(-1))
+        self.assertIsNone(self.timeline.bin_index(11))
+
+    def test_counts(self):
+        counts = self.timeline.counts([(0.5, 2.5), (2.2, 2.3), (9.5, 20), (-5, -1)])
+        self.assertEqual(counts, [1, 1, 2, 0, 0, 0, 0, 0, 0, 1])
+
+    def test_counts_match_a_scan_of_every_bin(self):
+        rand = random.Random(7)
+        timeline = Timeline(100.0, 137.0, 350)
+        intervals = []
+        for x in range(500):
+            start = rand.uniform(95, 140)
+            intervals.append((start, start + rand.expovariate(0.5)))
+        expected = [
+            len([1 for (a, b) in intervals if a <= hi and b >= lo])
+            for (lo, hi) in timeline.bins()
+        ]
+        self.assertEqual(timeline.counts(intervals), expected)
+
+    def test_point_counts(self):
+        self.assertEqual(self.timeline.point_counts([0.1, 0.2, 5.5, 42])[:6], [2, 0, 0, 0, 0, 1])
+
+    def test_concurrency_curve(self):
+        curve = concurrency_curve([(1, 4), (2, 3), (3, 5), (6, None)])
+        self.assertEqual(curve, [(1, 1), (2, 2), (4, 1), (5, 0)])
+
+
+if __name__ == '__main__':
+    unittest.main()